@@ -1,66 +1,233 @@
 from __future__ import annotations
 
+import ast
+import fcntl
 import json
+import os
 import re
+import shutil
 import tempfile
-from pathlib import Path
+import threading
+from collections.abc import Collection, Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from pathlib import Path, PurePosixPath
 
 from rich.console import Console
 from rich.panel import Panel
 
 from .git_utils import (
+    RepoState,
     add_all,
     apply_patch,
-    checkout,
+    check_patch,
     checkout_new,
     clone_repo,
     commit,
-    current_branch,
     ensure_git_identity,
     fetch_all,
     git,
-    git_status_short,
     list_tracked_files,
-    pull,
     push,
     set_origin_with_token,
-    working_tree_dirty,
 )
 from .github_api import GitHubREST, normalize_repo
-from .llm import get_llm
+from .llm import CachedLLM, LLMClient, get_llm
 from .prompts import IssueContext, build_file_select_prompt, build_patch_prompt
 from .settings import Settings
-from .state import AgentLabels, get_iteration, iter_labels
-from .text_utils import extract_first_json, extract_unified_diff
+from .state import LABELS, get_iteration, iter_labels
+from .text_utils import extract_first_json
 
 console = Console()
 
 AGENT_PR_MARKER = "<!--sdlc-agent:pr="
 AGENT_REVIEW_MARKER = "<!--sdlc-agent-review-->"
 
+_WS_RE = re.compile(r"\s+")
+_PR_MARKER_RE = re.compile(r"<!--sdlc-agent:pr=(\d+)-->")
+# PR body markers: files selected by run_issue, and those among them it meant to edit
+_FILES_MARKER_RES = {
+    key: re.compile(rf"<!--sdlc-agent:{key}=(\[.*?\])-->", re.DOTALL)
+    for key in ("files", "primary")
+}
+_CLOSES_RE = re.compile(r"Closes\s+#(\d+)", re.IGNORECASE | re.ASCII)
+_FENCE_LANG_RE = re.compile(r"^```[a-zA-Z]*\n?")
+_TOKEN_RE = re.compile(r"[^\W_]{3,}")
+
+# clones kept under <cache_dir>/repos between runs (least recently used are evicted)
+MAX_CACHED_REPOS = 8
+# lock file descriptors of cached clones in use by this process, held until it exits
+_REPO_LOCKS: dict[Path, int] = {}
+
+# upper bound of paths shown to the LLM in the file-selection prompt
+SELECT_CANDIDATES = 500
+
+# files the LLM means to edit go into the patch prompt in full, large Python files besides them
+# as an outline; without such a list from the LLM the first PRIMARY_FILES selected files count as it
+PRIMARY_FILES = 2
+OUTLINE_MIN_BYTES = 8_000
+# larger files are not parsed for an outline: their head is read within max_chars like any other file
+OUTLINE_MAX_BYTES = 1_000_000
+
+PATCH_ATTEMPTS = 2
+# text allowed before the first 'diff --git' header (the prompt asks for a short plan first)
+PREAMBLE_MAX_CHARS = 10_000
+_PATCH_SYSTEM = (
+    "Верни ТОЛЬКО unified diff (git). Никакого текста/плана/markdown. Начинай с 'diff --git'."
+)
+
 
 def _shorten(s: str, n: int = 72) -> str:
-    s = re.sub(r"\s+", " ", s).strip()
+    # isprintable() rules out every whitespace but ' ': nothing for the regex to collapse
+    if len(s) <= n and "  " not in s and s.isprintable():
+        return s.strip()
+    s = _WS_RE.sub(" ", s).strip()
     return s if len(s) <= n else s[: n - 1] + "…"
 
 
-def _read_file(repo_dir: Path, rel_path: str, *, max_chars: int = 20_000) -> str:
+def _outline_py(source: str) -> str | None:
+    """Class/function signatures with the first docstring line and line number; None if it doesn't parse."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    out: list[str] = []
+
+    def visit(body: list[ast.stmt], indent: str) -> None:
+        for node in body:
+            if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            out.extend(f"{indent}@{ast.unparse(d)}" for d in node.decorator_list)
+            if isinstance(node, ast.ClassDef):
+                bases = ", ".join(ast.unparse(b) for b in [*node.bases, *node.keywords])
+                out.append(
+                    f"L{node.lineno}: {indent}class {node.name}" + (f"({bases}):" if bases else ":")
+                )
+            else:
+                prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+                out.append(
+                    f"L{node.lineno}: {indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}:"
+                )
+            doc = ast.get_docstring(node)
+            if doc:
+                out.append(f'{indent}    """{doc.strip().splitlines()[0]}"""')
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, indent + "    ")
+
+    visit(tree.body, "")
+    return "\n".join(out)
+
+
+def _read_file(
+    repo_dir: Path, rel_path: str, *, max_chars: int = 20_000, outline: bool = False
+) -> str:
     path = repo_dir / rel_path
     if not path.exists():
         return f"<MISSING FILE: {rel_path}>"
-    text = path.read_text(encoding="utf-8", errors="replace")
-    if len(text) > max_chars:
-        return text[:max_chars] + f"\n\n<TRUNCATED: {len(text)} chars total>"
+    if outline and rel_path.endswith(".py"):
+        size = path.stat().st_size
+        if OUTLINE_MIN_BYTES < size <= OUTLINE_MAX_BYTES:
+            summary = _outline_py(path.read_text(encoding="utf-8", errors="replace"))
+            if summary is not None:
+                return f"<OUTLINE ONLY: signatures of {size} bytes>\n{summary[:max_chars]}"
+    # a UTF-8 char is at most 4 bytes: never read (and decode) more than can end up in the prompt
+    max_bytes = max_chars * 4
+    with path.open("rb") as f:
+        raw = f.read(max_bytes + 1)
+    text = raw.decode("utf-8", errors="replace")
+    if len(text) > max_chars or len(raw) > max_bytes:
+        return text[:max_chars] + f"\n\n<TRUNCATED: {path.stat().st_size} bytes total>"
     return text
 
 
-def _ensure_repo_dir(repo_full_name: str, *, token: str, repo_dir: Path | None) -> Path:
+def _read_files(
+    repo_dir: Path, rel_paths: list[str], *, primary: Collection[str] | None = None
+) -> dict[str, str]:
+    """
+    Read several files concurrently (file reads release the GIL). Keeps input order.
+    With primary given, only those files are read in full, large Python files besides them as an outline.
+    """
+    outline = [primary is not None and p not in primary for p in rel_paths]
+    if len(rel_paths) <= 1:
+        return {
+            p: _read_file(repo_dir, p, outline=o) for p, o in zip(rel_paths, outline, strict=True)
+        }
+    with ThreadPoolExecutor(max_workers=min(8, len(rel_paths))) as ex:
+        contents = list(ex.map(lambda p, o: _read_file(repo_dir, p, outline=o), rel_paths, outline))
+    return dict(zip(rel_paths, contents, strict=True))
+
+
+def _try_lock(clone: Path) -> int | None:
+    """Exclusive lock on a cached clone (a sibling .lock file); None if another run holds it."""
+    fd = os.open(clone.parent / f"{clone.name}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _evict_cached_repos(root: Path, *, keep: int) -> None:
+    """Remove least recently used clones under root so that at most `keep` remain. Clones in use are kept."""
+    if not root.is_dir():
+        return
+    clones = sorted((d for d in root.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime)
+    for old in clones[: max(0, len(clones) - keep)]:
+        if old in _REPO_LOCKS:
+            continue
+        fd = _try_lock(old)
+        if fd is None:
+            continue
+        try:
+            shutil.rmtree(old, ignore_errors=True)
+        finally:
+            os.close(fd)
+
+
+def _ensure_repo_dir(
+    repo_full_name: str,
+    *,
+    token: str,
+    repo_dir: Path | None,
+    cache_dir: Path,
+    partial: bool = True,
+) -> Path:
     if repo_dir and (repo_dir / ".git").exists():
         return repo_dir
 
-    tmp = Path(tempfile.mkdtemp(prefix="sdlc-agent-"))
-    dest = tmp / repo_full_name.replace("/", "__")
-    clone_repo(repo_full_name, token=token, dest=dest)
+    filter_spec = "blob:none" if partial else None
+    dest = cache_dir / "repos" / repo_full_name.replace("/", "__")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest not in _REPO_LOCKS:
+        fd = _try_lock(dest)
+        if fd is None:
+            # another run on this host works in the cached clone: use a throwaway one
+            tmp = Path(tempfile.mkdtemp(prefix="sdlc-agent-")) / dest.name
+            clone_repo(repo_full_name, token=token, dest=tmp, filter_spec=filter_spec)
+            return tmp
+        _REPO_LOCKS[dest] = fd
+
+    if (dest / ".git").exists():
+        # clone from a previous run: drop its leftovers, callers fetch incrementally
+        git(["reset", "--hard", "--quiet"], cwd=dest)
+        git(["clean", "-ffdxq"], cwd=dest)
+        # local branches may lag behind (or outlive) their remotes: callers check them out anew from origin
+        git(["checkout", "--detach", "--quiet"], cwd=dest)
+        branches = git(
+            ["for-each-ref", "--format=%(refname:short)", "refs/heads/"], cwd=dest
+        ).stdout.split()
+        if branches:
+            git(["branch", "-D", "--quiet", *branches], cwd=dest)
+        os.utime(dest)
+        return dest
+
+    shutil.rmtree(dest, ignore_errors=True)  # interrupted clone
+    _evict_cached_repos(dest.parent, keep=MAX_CACHED_REPOS - 1)
+    # blobs are fetched on demand: the agent only reads a handful of files at HEAD
+    clone_repo(repo_full_name, token=token, dest=dest, filter_spec=filter_spec)
     return dest
 
 
@@ -73,17 +240,30 @@ def _find_pr_number_in_issue_comments(gh: GitHubREST, issue_number: int) -> int
     for c in reversed(comments):
         body = c.get("body", "")
         if AGENT_PR_MARKER in body:
-            m = re.search(r"<!--sdlc-agent:pr=(\d+)-->", body)
+            m = _PR_MARKER_RE.search(body)
             if m:
                 return int(m.group(1))
     return None
 
 
 def _find_issue_number_in_pr_body(pr_body: str) -> int | None:
-    m = re.search(r"Closes\s+#(\d+)", pr_body, flags=re.IGNORECASE)
+    m = _CLOSES_RE.search(pr_body)
     return int(m.group(1)) if m else None
 
 
+def _find_files_in_pr_body(pr_body: str, *, key: str = "files") -> list[str]:
+    """Files selected (key="files") or meant to be edited (key="primary") by run_issue,
+    recorded in the PR body; [] if absent or unreadable."""
+    m = _FILES_MARKER_RES[key].search(pr_body)
+    if not m:
+        return []
+    try:
+        files = json.loads(m.group(1))
+    except json.JSONDecodeError:
+        return []
+    return [p for p in files if isinstance(p, str)][:8]
+
+
 def _find_latest_reviewer_feedback(gh: GitHubREST, pr_number: int) -> str | None:
     # NOTE: for demo we read issue comments on PR
     comments = gh.list_issue_comments(pr_number)
@@ -105,6 +285,33 @@ def _safe_remove_label(gh: GitHubREST, number: int, label: str) -> None:
         return
 
 
+def _prepare_workdir(repo_full_name: str, *, repo_dir: Path | None, settings: Settings) -> Path:
+    """Clone (or reuse) the repo, configure identity/origin and fetch."""
+    workdir = _ensure_repo_dir(
+        repo_full_name,
+        token=settings.github_token,
+        repo_dir=repo_dir,
+        cache_dir=Path(settings.cache_dir),
+        partial=settings.partial_clone,
+    )
+    ensure_git_identity(cwd=workdir, name=settings.git_user_name, email=settings.git_user_email)
+    set_origin_with_token(repo_full_name, token=settings.github_token, cwd=workdir)
+    fetch_all(cwd=workdir)
+    return workdir
+
+
+def _bump_iteration_label(
+    gh: GitHubREST, pr_number: int, labels_list: list[str], next_iter: int
+) -> None:
+    # one PUT with the final set instead of a DELETE per old iter label + POST
+    old = set(iter_labels(labels_list))
+    final = [lab for lab in labels_list if lab not in old] + [LABELS.iter_label(next_iter)]
+    try:
+        gh.set_labels(pr_number, final)
+    except Exception:
+        pass
+
+
 def _checkout_branch(workdir: Path, branch: str) -> None:
     res = git(["checkout", branch], cwd=workdir, check=False)
     if res.returncode == 0:
@@ -113,108 +320,264 @@ def _checkout_branch(workdir: Path, branch: str) -> None:
     git(["checkout", "-B", branch, f"origin/{branch}"], cwd=workdir, check=False)
 
 
-def _normalize_patch(text: str) -> str:
-    """Extract a clean unified diff from LLM output (strip markdown/text around)."""
-    if not text:
-        return ""
-    t = text.strip()
+_DIFF_LINE_PREFIXES = (
+    "diff --git ",
+    "index ",
+    "--- ",
+    "+++ ",
+    "@@ ",
+    "new file mode ",
+    "deleted file mode ",
+    "similarity index ",
+    "rename from ",
+    "rename to ",
+    "old mode ",
+    "new mode ",
+    "Binary files ",
+    "\\ No newline at end of file",
+)
+
 
-    # Try to pick the fenced block that contains a diff
-    if "```" in t:
-        parts = t.split("```")
-        cand = [p for p in parts if "diff --git" in p]
-        if cand:
-            t = cand[0]
-        else:
-            t = t.replace("```diff", "").replace("```", "")
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Re-split streamed text chunks into complete lines."""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for ln in lines:
+            yield ln.removesuffix("\r")
+    if pending:
+        yield pending.removesuffix("\r")
 
-    # Cut everything before first diff header
-    idx = t.find("diff --git")
-    if idx != -1:
-        t = t[idx:]
 
-    return t.strip() + "\n"
+def _clean_patch(raw: str | Iterable[str], allow_paths: list[str] | None = None) -> str:
+    """
+    Extract a clean unified diff from LLM output in a single pass over its lines.
+    raw is the full text or a stream of text chunks; a stream is only consumed as far as needed.
 
+    - Everything before the first 'diff --git' header is skipped; a fence after it ends the diff.
+    - Output with no header within PREAMBLE_MAX_CHARS is given up on.
+    - Lines that are not valid unified-diff syntax are dropped (LLM plan/markdown inside hunks).
+    - If allow_paths provided, keep only blocks whose header mentions one of them.
+    Fallback: keep the first block.
+    """
+    lines: Iterable[str]
+    if isinstance(raw, str):
+        # jump straight to the first header: well-formed output starts there, chatty output
+        # skips its plan/preamble without splitting it into lines
+        if raw.startswith("diff --git "):
+            start = 0
+        else:
+            start = raw.find("\ndiff --git ") + 1
+            if not start:
+                return ""
+        lines = raw[start:].splitlines()
+    else:
+        lines = _iter_lines(raw)
 
-def _split_diff_blocks(patch: str) -> list[str]:
-    """Split a unified diff into 'diff --git ...' blocks."""
-    if not patch:
-        return []
-    lines = patch.splitlines(True)
-    blocks: list[list[str]] = []
-    cur: list[str] = []
+    blocks: list[list[str]] = []  # the first block, then blocks matching allow_paths
+    first_allowed = False
+    cur: list[str] | None = None
+    preamble = 0
 
     for ln in lines:
+        if ln.startswith("```"):
+            if blocks:
+                break
+            continue
         if ln.startswith("diff --git "):
-            if cur:
-                blocks.append(cur)
+            matches = bool(allow_paths) and any(p in ln for p in allow_paths or ())
+            if not blocks:
+                first_allowed = matches
+            elif not allow_paths:
+                break
+            elif not matches:
+                cur = None
+                continue
             cur = [ln]
-        else:
-            if cur:
-                cur.append(ln)
+            blocks.append(cur)
+        # hunk lines are the vast majority: test their first char before the header prefixes
+        elif cur is not None and (ln[:1] in (" ", "+", "-") or ln.startswith(_DIFF_LINE_PREFIXES)):
+            cur.append(ln)
+        elif not blocks:
+            preamble += len(ln)
+            if preamble > PREAMBLE_MAX_CHARS:
+                break
 
-    if cur:
-        blocks.append(cur)
+    if allow_paths and (first_allowed or len(blocks) > 1):
+        blocks = blocks if first_allowed else blocks[1:]
+    else:
+        blocks = blocks[:1]
 
-    return ["".join(b) for b in blocks]
+    lines = [ln for b in blocks for ln in b]
+    return "\n".join(lines) + "\n" if lines else ""
 
 
-def _filter_diff_blocks(patch: str, allow_paths: list[str] | None = None) -> str:
+def _rank_files(
+    issue_ctx: IssueContext, all_files: list[str], *, limit: int = SELECT_CANDIDATES
+) -> list[str]:
     """
-    Keep only well-formed diff blocks.
-    If allow_paths provided, keep only blocks whose 'diff --git' header mentions one of them.
-    Fallback: keep the first block.
+    Pre-filter candidate paths for the file-selection prompt on large repos.
+    Paths sharing more words with the issue title/body come first; repo order breaks ties.
     """
-    blocks = _split_diff_blocks(patch)
-    if not blocks:
-        return patch
+    if len(all_files) <= limit:
+        return all_files
+    words = set(_TOKEN_RE.findall(f"{issue_ctx.title}\n{issue_ctx.body}".lower()))
+    ranked = sorted(
+        all_files,
+        key=lambda p: len(words.intersection(_TOKEN_RE.findall(p.lower()))),
+        reverse=True,
+    )
+    return ranked[:limit]
 
-    if allow_paths:
-        kept = []
-        for b in blocks:
-            header = b.splitlines()[0]
-            if any(p in header for p in allow_paths):
-                kept.append(b)
-        if kept:
-            return "".join(kept)
 
-    return blocks[0]
+def _tracked_only(
+    paths: list[str], workdir: Path, *, tracked: list[str] | None = None
+) -> list[str]:
+    """
+    Keep the paths that are tracked files of the repo, in order.
+    They come from the LLM or the user-editable PR body: absolute and '..' paths never reach _read_file.
+    """
+    known = set(list_tracked_files(cwd=workdir) if tracked is None else tracked)
+    return [
+        p
+        for p in paths
+        if p in known and not PurePosixPath(p).is_absolute() and ".." not in PurePosixPath(p).parts
+    ]
 
 
-def _sanitize_unified_diff(patch: str) -> str:
+def _select_files(
+    llm: LLMClient, issue_ctx: IssueContext, workdir: Path
+) -> tuple[list[str], list[str]]:
     """
-    Drop any lines that are not valid unified-diff syntax.
-    Prevents LLM from inserting plain text inside hunks.
+    Ask the LLM which tracked files to read for the issue (at most 8)
+    and which of them it will edit. Returns (files, primary); primary may be empty.
     """
-    if not patch:
-        return ""
-
-    allowed_starts = (
-        "diff --git ",
-        "index ",
-        "--- ",
-        "+++ ",
-        "@@ ",
-        "new file mode ",
-        "deleted file mode ",
-        "similarity index ",
-        "rename from ",
-        "rename to ",
-        "old mode ",
-        "new mode ",
-        "Binary files ",
-        "\\ No newline at end of file",
-    )
+    tracked = list_tracked_files(cwd=workdir)
+    all_files = _rank_files(issue_ctx, tracked)
+    select_prompt = build_file_select_prompt(issue_ctx, all_files)
 
-    out: list[str] = []
-    for ln in patch.splitlines():
-        if ln.startswith(allowed_starts) or (ln and ln[0] in (" ", "+", "-")):
-            out.append(ln)
-        else:
-            # мусор (план/markdown/текст) — выкидываем
-            continue
+    system = "Ты выбираешь файлы для чтения."
+    sel_raw = llm.complete(system=system, user=select_prompt, temperature=0.0)
+    try:
+        sel = extract_first_json(sel_raw)
+        if not isinstance(sel, dict):
+            raise ValueError(f"Unexpected file selection: {sel_raw[:200]}")
+    except ValueError:
+        # don't let a rerun replay the same unusable answer from the cache
+        if isinstance(llm, CachedLLM):
+            llm.discard(system=system, user=select_prompt, temperature=0.0)
+        raise
+
+    def paths(key: str) -> list[str]:
+        value = sel.get(key)
+        if not isinstance(value, list):
+            return []
+        return _tracked_only([p for p in value if isinstance(p, str)], workdir, tracked=tracked)
+
+    primary = paths("primary")
+    # files to edit first: the cap never drops one of them
+    files = list(dict.fromkeys([*primary, *paths("files")]))[:8]
+    if not files:
+        files = all_files[:3]
+    return files, [p for p in primary if p in files]
+
+
+def _until(chunks: Iterable[str], stop: threading.Event) -> Iterator[str]:
+    """Pass chunks through until stop is set."""
+    for chunk in chunks:
+        if stop.is_set():
+            return
+        yield chunk
+
+
+def _generate_patch(
+    llm: LLMClient,
+    patch_prompt: str,
+    attempt: int,
+    allow: list[str] | None,
+    stop: threading.Event | None = None,
+) -> str:
+    """Stream one patch attempt and clean it while it is generated.
+    Reading stops at the end of the diff, or once stop is set, so trailing explanations
+    (and attempts nobody needs any more) are never waited for."""
+    with closing(
+        llm.complete_stream(
+            system=_PATCH_SYSTEM,
+            user=patch_prompt
+            + (
+                f"\n\nПопытка #{attempt}. Если раньше патч не применился — исправь diff так, чтобы он применился git apply."
+                if attempt > 1
+                else ""
+            ),
+            temperature=0.0,
+        )
+    ) as chunks:
+        return _clean_patch(chunks if stop is None else _until(chunks, stop), allow)
+
+
+def _iter_patches(
+    llm: LLMClient, patch_prompt: str, *, allow: list[str] | None, concurrency: int
+) -> Generator[tuple[str, str], None, None]:
+    """
+    Yield (patch, error) per attempt: a cleaned patch and '', or '' and why the attempt failed.
+    With concurrency > 1 all attempts are requested speculatively and yielded as they complete;
+    closing the iterator cancels the attempts that have not started and stops the running ones.
+    """
+    if concurrency <= 1:
+        for attempt in range(1, PATCH_ATTEMPTS + 1):
+            try:
+                yield _generate_patch(llm, patch_prompt, attempt, allow), ""
+            except Exception as e:
+                yield "", f"{type(e).__name__}: {e}"
+        return
 
-    return "\n".join(out).strip() + "\n"
+    stop = threading.Event()
+    ex = ThreadPoolExecutor(max_workers=min(concurrency, PATCH_ATTEMPTS))
+    try:
+        futures = [
+            ex.submit(_generate_patch, llm, patch_prompt, attempt, allow, stop)
+            for attempt in range(1, PATCH_ATTEMPTS + 1)
+        ]
+        for fut in as_completed(futures):
+            try:
+                yield fut.result(), ""
+            except Exception as e:
+                yield "", f"{type(e).__name__}: {e}"
+    finally:
+        stop.set()
+        ex.shutdown(wait=False, cancel_futures=True)
+
+
+def _apply_llm_patch(
+    llm: LLMClient,
+    patch_prompt: str,
+    *,
+    workdir: Path,
+    allow: list[str] | None,
+    concurrency: int,
+) -> str:
+    """Ask the LLM for a patch and apply it. Returns '' on success, else the last error (git apply stderr)."""
+    last_err = ""
+    # at temperature 0 the retry often returns the very same diff: don't apply it twice
+    failed: dict[str, str] = {}
+    with closing(_iter_patches(llm, patch_prompt, allow=allow, concurrency=concurrency)) as patches:
+        for patch, err in patches:
+            if err:
+                # a failed LLM call: the other attempts may still bring a patch
+                last_err = err[-2000:]
+                continue
+            if patch in failed:
+                last_err = failed[patch]
+                continue
+            # a patch that does not fully apply goes straight to the next attempt, no .rej left behind
+            apply_res = check_patch(patch, cwd=workdir)
+            if apply_res.returncode == 0:
+                apply_res = apply_patch(patch, cwd=workdir)
+            if apply_res.returncode == 0:
+                return ""
+            last_err = failed[patch] = (apply_res.stderr or "")[-2000:]
+    return last_err
 
 
 def _safe_comment(gh: GitHubREST, number: int, body: str) -> None:
@@ -226,26 +589,35 @@ def _safe_comment(gh: GitHubREST, number: int, body: str) -> None:
 
 def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings: Settings) -> None:
     """Process Issue -> create/update PR."""
-    repo_full_name = normalize_repo(repo)
-    gh = GitHubREST(
+    with GitHubREST(
         token=settings.github_token,
-        repo_full_name=repo_full_name,
+        repo_full_name=normalize_repo(repo),
         api_base=settings.github_api_base,
-    )
+    ) as gh:
+        _run_issue(gh, issue_number=issue_number, repo_dir=repo_dir, settings=settings)
+
+
+def _run_issue(
+    gh: GitHubREST, *, issue_number: int, repo_dir: Path | None, settings: Settings
+) -> None:
+    repo_full_name = gh.repo_full_name
+    branch = f"agent/issue-{issue_number}"
+    llm = get_llm(settings, prompt_cache_key=f"sdlc-{repo_full_name}")
+
+    # GitHub lookups run while the repo is cloned/fetched
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        issue_future = ex.submit(gh.get_issue, issue_number)
+        base_future = ex.submit(lambda: settings.base_branch or gh.default_branch())
+        workdir = _prepare_workdir(repo_full_name, repo_dir=repo_dir, settings=settings)
+        issue = issue_future.result()
+        base_branch = base_future.result()
 
-    issue = gh.get_issue(issue_number)
     issue_ctx = IssueContext(
         number=issue_number,
         title=issue.get("title", ""),
         body=issue.get("body") or "",
     )
 
-    base_branch = settings.base_branch or gh.default_branch()
-    branch = f"agent/issue-{issue_number}"
-
-    llm = get_llm(settings)
-    workdir = _ensure_repo_dir(repo_full_name, token=settings.github_token, repo_dir=repo_dir)
-
     console.print(
         Panel.fit(
             f"[bold]Repo[/bold]: {repo_full_name}\n[bold]Workdir[/bold]: {workdir}\n[bold]Issue[/bold]: #{issue_number}",
@@ -253,37 +625,19 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
         )
     )
 
-    ensure_git_identity(cwd=workdir, name=settings.git_user_name, email=settings.git_user_email)
-    set_origin_with_token(repo_full_name, token=settings.github_token, cwd=workdir)
-    fetch_all(cwd=workdir)
-
-    checkout(base_branch, cwd=workdir)
-    pull(cwd=workdir)
+    # origin was just fetched: fast-forward the base locally instead of a second network round-trip via pull.
+    # --ff-only fails loudly rather than dropping unpushed commits of a user's working copy
+    git(["checkout", base_branch], cwd=workdir)
+    git(["merge", "--ff-only", "--quiet", f"origin/{base_branch}"], cwd=workdir)
 
     res = git(["checkout", branch], cwd=workdir, check=False)
     if res.returncode != 0:
         checkout_new(branch, cwd=workdir)
 
-    console.print(f"[green]On branch[/green] {current_branch(cwd=workdir)}")
-
-    all_files = list_tracked_files(cwd=workdir)
-    select_prompt = build_file_select_prompt(issue_ctx, all_files)
-
-    sel_raw = llm.complete(system="Ты выбираешь файлы для чтения.", user=select_prompt, temperature=0.0)
-    sel = extract_first_json(sel_raw)
-
-    files = [p for p in sel.get("files", []) if isinstance(p, str)]
-    if not files:
-        files = all_files[:3]
-    files = files[:8]
-
-    # fast/robust demo mode: README-only issues should only touch README
-    if "readme" in issue_ctx.title.lower():
-        files = ["README.md"]
-
-    files_with_content = {p: _read_file(workdir, p) for p in files}
-    patch_prompt = build_patch_prompt(issue_ctx, files_with_content, feedback=None)
+    console.print(f"[green]On branch[/green] {branch}")
 
+    files: list[str] = []
+    primary: list[str] = []
     # If it's a README task, do full-file rewrite (more reliable than git apply)
     if "readme" in issue_ctx.title.lower():
         readme_path = workdir / "README.md"
@@ -308,49 +662,29 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
 
         # strip accidental fences if model adds them
         if new_text.startswith("```"):
-            new_text = re.sub(r"^```[a-zA-Z]*\n?", "", new_text)
+            new_text = _FENCE_LANG_RE.sub("", new_text)
             new_text = new_text.replace("```", "").strip()
 
         readme_path.write_text(new_text + "\n", encoding="utf-8")
 
     else:
-        patch = None
-        last_err = ""
-        allow = None
-
-        for attempt in range(1, 3):
-            patch_raw = llm.complete(
-                system="Верни ТОЛЬКО unified diff (git). Никакого текста/плана/markdown. Начинай с 'diff --git'.",
-                user=patch_prompt
-                + (
-                    f"\n\nПопытка #{attempt}. Если раньше патч не применился — исправь diff так, чтобы он применился git apply."
-                    if attempt > 1
-                    else ""
-                ),
-                temperature=0.0,
-            )
-
-            patch = extract_unified_diff(patch_raw) or patch_raw
-            patch = _normalize_patch(patch)
-            patch = _sanitize_unified_diff(patch)
-            patch = _filter_diff_blocks(patch, allow_paths=allow)
-
-            apply_res = apply_patch(patch, cwd=workdir)
-            if apply_res.returncode == 0:
-                last_err = ""
-                break
-            last_err = (apply_res.stderr or "")[-2000:]
-
+        files, primary = _select_files(llm, issue_ctx, workdir)
+        files_with_content = _read_files(workdir, files, primary=primary or files[:PRIMARY_FILES])
+        patch_prompt = build_patch_prompt(issue_ctx, files_with_content, feedback=None)
+        last_err = _apply_llm_patch(
+            llm,
+            patch_prompt,
+            workdir=workdir,
+            allow=None,
+            concurrency=settings.llm_concurrency,
+        )
         if last_err:
-            msg = (
-                "❌ Не смог применить патч (git apply).\n\n"
-                f"stderr:\n```\n{last_err}\n```"
-            )
+            msg = f"❌ Не смог применить патч (git apply).\n\nstderr:\n```\n{last_err}\n```"
             _safe_comment(gh, issue_number, msg)
             raise RuntimeError(msg)
 
-    status = git_status_short(cwd=workdir)
-    if ".rej" in status:
+    repo_state = RepoState.read(cwd=workdir)
+    if repo_state.has_rej:
         msg = (
             "❌ Патч применился частично, появились .rej файлы. "
             "Нужна следующая итерация с корректным diff."
@@ -358,7 +692,7 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
         _safe_comment(gh, issue_number, msg)
         raise RuntimeError(msg)
 
-    if not working_tree_dirty(cwd=workdir):
+    if not repo_state.dirty:
         _safe_comment(gh, issue_number, "ℹ️ Агент не внёс изменений (working tree чист).")
         return
 
@@ -367,27 +701,26 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
     commit(commit_msg, cwd=workdir)
     push(branch, cwd=workdir)
 
-    # Create or reuse PR
-    pr_number = _find_pr_number_in_issue_comments(gh, issue_number)
-    pr = None
+    # Create or reuse PR: the branch name identifies it, one filtered list call instead of scanning comments
+    existing = gh.list_pulls(state="open", head=f"{gh.owner}:{branch}")
+    pr_number = (
+        existing[0]["number"] if existing else _find_pr_number_in_issue_comments(gh, issue_number)
+    )
     if pr_number:
-        pr = gh.get_pull(pr_number)
+        pr = existing[0] if existing else gh.get_pull(pr_number)
         console.print(f"[yellow]Updating existing PR[/yellow] #{pr_number}")
     else:
-        head = f"{gh.owner}:{branch}"
-        existing = gh.list_pulls(state="open", head=head)
-        if existing:
-            pr = existing[0]
-            pr_number = pr["number"]
-        else:
-            pr_title = issue_ctx.title or f"Issue #{issue_number}"
-            pr_body = (
-                f"Closes #{issue_number}\n\n"
-                "Generated by **sdlc-agent**.\n"
-                f"- Branch: `{branch}`\n"
-            )
-            pr = gh.create_pull(title=pr_title, body=pr_body, head=branch, base=base_branch, draft=False)
-            pr_number = pr["number"]
+        pr_title = issue_ctx.title or f"Issue #{issue_number}"
+        pr_body = f"Closes #{issue_number}\n\nGenerated by **sdlc-agent**.\n- Branch: `{branch}`\n"
+        if files:
+            # run_fix reads the same files instead of asking the LLM again
+            pr_body += f"\n<!--sdlc-agent:files={json.dumps(files, ensure_ascii=False)}-->\n"
+            if primary:
+                pr_body += f"<!--sdlc-agent:primary={json.dumps(primary, ensure_ascii=False)}-->\n"
+        pr = gh.create_pull(
+            title=pr_title, body=pr_body, head=branch, base=base_branch, draft=False
+        )
+        pr_number = pr["number"]
 
         _safe_comment(
             gh,
@@ -395,9 +728,8 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
             f"✅ PR создан: {pr.get('html_url')}\n\n<!--sdlc-agent:pr={pr_number}-->",
         )
 
-    labels = AgentLabels()
     try:
-        gh.add_labels(pr_number, [labels.managed, labels.iter_label(1)])
+        gh.add_labels(pr_number, [LABELS.managed, LABELS.iter_label(1)])
     except Exception as e:
         console.print(f"[yellow]WARN[/yellow] cannot add labels: {e}")
 
@@ -406,13 +738,16 @@ def run_issue(*, repo: str, issue_number: int, repo_dir: Path | None, settings:
 
 def run_fix(*, repo: str, pr_number: int, repo_dir: Path | None, settings: Settings) -> None:
     """Process PR labeled with agent:fix -> push next commit to same PR."""
-    repo_full_name = normalize_repo(repo)
-    gh = GitHubREST(
+    with GitHubREST(
         token=settings.github_token,
-        repo_full_name=repo_full_name,
+        repo_full_name=normalize_repo(repo),
         api_base=settings.github_api_base,
-    )
+    ) as gh:
+        _run_fix(gh, pr_number=pr_number, repo_dir=repo_dir, settings=settings)
+
 
+def _run_fix(gh: GitHubREST, *, pr_number: int, repo_dir: Path | None, settings: Settings) -> None:
+    repo_full_name = gh.repo_full_name
     pr = gh.get_pull(pr_number)
     pr_body = pr.get("body") or ""
     issue_number = _find_issue_number_in_pr_body(pr_body)
@@ -426,10 +761,9 @@ def run_fix(*, repo: str, pr_number: int, repo_dir: Path | None, settings: Setti
         body=issue.get("body") or "",
     )
 
-    pr_issue = gh.get_issue(pr_number)
-    labels_list = [label["name"] for label in pr_issue.get("labels", [])]
+    # the pull payload carries the labels too: no second request for the PR as an issue
+    labels_list = [label["name"] for label in pr.get("labels") or []]
 
-    labels = AgentLabels()
     cur_iter = get_iteration(labels_list)
     if cur_iter >= settings.max_iters:
         _safe_comment(
@@ -438,26 +772,23 @@ def run_fix(*, repo: str, pr_number: int, repo_dir: Path | None, settings: Setti
             f"🛑 Достигнут лимит итераций ({settings.max_iters}). Останавливаюсь. Нужно вмешательство человека.",
         )
         try:
-            gh.add_labels(pr_number, [labels.stopped])
+            gh.set_labels(
+                pr_number, [lab for lab in labels_list if lab != LABELS.fix] + [LABELS.stopped]
+            )
         except Exception:
             pass
-        _safe_remove_label(gh, pr_number, labels.fix)
         return
 
     next_iter = cur_iter + 1 if cur_iter else 2  # first fix is iter=2
+    llm = get_llm(settings, prompt_cache_key=f"sdlc-{repo_full_name}")
 
-    # update iteration labels
-    for old in iter_labels(labels_list):
-        _safe_remove_label(gh, pr_number, old)
-    try:
-        gh.add_labels(pr_number, [labels.iter_label(next_iter)])
-    except Exception:
-        pass
-
-    feedback = _find_latest_reviewer_feedback(gh, pr_number)
-
-    llm = get_llm(settings)
-    workdir = _ensure_repo_dir(repo_full_name, token=settings.github_token, repo_dir=repo_dir)
+    # label bookkeeping and the feedback lookup run while the repo is cloned/fetched
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        labels_future = ex.submit(_bump_iteration_label, gh, pr_number, labels_list, next_iter)
+        feedback_future = ex.submit(_find_latest_reviewer_feedback, gh, pr_number)
+        workdir = _prepare_workdir(repo_full_name, repo_dir=repo_dir, settings=settings)
+        feedback = feedback_future.result()
+        labels_future.result()
 
     console.print(
         Panel.fit(
@@ -466,75 +797,50 @@ def run_fix(*, repo: str, pr_number: int, repo_dir: Path | None, settings: Setti
         )
     )
 
-    ensure_git_identity(cwd=workdir, name=settings.git_user_name, email=settings.git_user_email)
-    set_origin_with_token(repo_full_name, token=settings.github_token, cwd=workdir)
-    fetch_all(cwd=workdir)
-
     head_ref = pr.get("head", {}).get("ref")
     if not head_ref:
         raise RuntimeError("PR head ref is missing")
 
     _checkout_branch(workdir, head_ref)
-    console.print(f"[green]On branch[/green] {current_branch(cwd=workdir)}")
-
-    all_files = list_tracked_files(cwd=workdir)
-    select_prompt = build_file_select_prompt(issue_ctx, all_files)
-
-    sel_raw = llm.complete(system="Ты выбираешь файлы для чтения.", user=select_prompt, temperature=0.0)
-    sel = extract_first_json(sel_raw)
-
-    files = [p for p in sel.get("files", []) if isinstance(p, str)]
-    if not files:
-        files = all_files[:3]
-    files = files[:8]
+    console.print(f"[green]On branch[/green] {head_ref}")
 
+    # README-only issues should only touch README: no need to ask the LLM which files to read
     if "readme" in issue_ctx.title.lower():
-        files = ["README.md"]
+        files = primary = ["README.md"]
+    else:
+        tracked = list_tracked_files(cwd=workdir)
+        files = _tracked_only(_find_files_in_pr_body(pr_body), workdir, tracked=tracked)
+        primary = _tracked_only(
+            _find_files_in_pr_body(pr_body, key="primary"), workdir, tracked=tracked
+        )
+        if not files:
+            files, primary = _select_files(llm, issue_ctx, workdir)
 
-    files_with_content = {p: _read_file(workdir, p) for p in files}
+    files_with_content = _read_files(workdir, files, primary=primary or files[:PRIMARY_FILES])
     patch_prompt = build_patch_prompt(issue_ctx, files_with_content, feedback=feedback)
 
-    patch = None
-    last_err = ""
     allow = ["README.md"] if "readme" in issue_ctx.title.lower() else None
-
-    for attempt in range(1, 3):
-        patch_raw = llm.complete(
-            system="Верни ТОЛЬКО unified diff (git). Никакого текста/плана/markdown. Начинай с 'diff --git'.",
-            user=patch_prompt
-            + (
-                f"\n\nПопытка #{attempt}. Если раньше патч не применился — исправь diff так, чтобы он применился git apply."
-                if attempt > 1
-                else ""
-            ),
-            temperature=0.0,
-        )
-
-        patch = extract_unified_diff(patch_raw) or patch_raw
-        patch = _normalize_patch(patch)
-        patch = _sanitize_unified_diff(patch)
-        patch = _filter_diff_blocks(patch, allow_paths=allow)
-
-        apply_res = apply_patch(patch, cwd=workdir)
-        if apply_res.returncode == 0:
-            last_err = ""
-            break
-        last_err = (apply_res.stderr or "")[-2000:]
-
+    last_err = _apply_llm_patch(
+        llm,
+        patch_prompt,
+        workdir=workdir,
+        allow=allow,
+        concurrency=settings.llm_concurrency,
+    )
     if last_err:
         _safe_comment(gh, pr_number, f"❌ Не смог применить патч:\n```\n{last_err}\n```")
 
         # ^ keep runtime simple even if type checker complains
         raise RuntimeError(last_err)
 
-    status = git_status_short(cwd=workdir)
-    if ".rej" in status:
+    repo_state = RepoState.read(cwd=workdir)
+    if repo_state.has_rej:
         _safe_comment(gh, pr_number, "❌ Патч применился частично (.rej). Нужна ещё одна итерация.")
         raise RuntimeError("Patch rejected (.rej)")
 
-    if not working_tree_dirty(cwd=workdir):
+    if not repo_state.dirty:
         _safe_comment(gh, pr_number, "ℹ️ Агент не внёс изменений (working tree чист).")
-        _safe_remove_label(gh, pr_number, labels.fix)
+        _safe_remove_label(gh, pr_number, LABELS.fix)
         return
 
     add_all(cwd=workdir)
@@ -547,4 +853,4 @@ def run_fix(*, repo: str, pr_number: int, repo_dir: Path | None, settings: Setti
         pr_number,
         f"🛠️ Push исправлений (итерация {next_iter}).\n\n- Branch: `{head_ref}`\n",
     )
-    _safe_remove_label(gh, pr_number, labels.fix)
+    _safe_remove_label(gh, pr_number, LABELS.fix)
@@ -2,12 +2,14 @@ from __future__ import annotations
 
 import re
 from collections.abc import Iterable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 from urllib.parse import urlparse
 
 import requests
 
+from .http_utils import new_session, request_with_retry
+
 
 class GitHubAPIError(RuntimeError):
     pass
@@ -42,6 +44,26 @@ class GitHubREST:
     repo_full_name: str
     api_base: str = "https://api.github.com"
     timeout_s: int = 30
+    # issue/PR number -> comments; dropped when we post a new comment there
+    _comments_cache: dict[int, list[dict[str, Any]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    # one keep-alive connection pool for all calls of an agent run
+    _session: requests.Session = field(
+        default_factory=new_session, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self._session.headers.update(self._headers())
+
+    def __enter__(self) -> GitHubREST:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._session.close()
 
     @property
     def owner(self) -> str:
@@ -50,7 +72,7 @@ class GitHubREST:
     @property
     def repo(self) -> str:
         return self.repo_full_name.split("/")[1]
-    
+
     def viewer(self) -> dict[str, Any]:
         """Return authenticated user for current token."""
         return self._request("GET", "/user")
@@ -59,8 +81,6 @@ class GitHubREST:
         user = self.viewer()
         return str(user.get("login") or "")
 
-    
-
     def _headers(self) -> dict[str, str]:
         return {
             "Accept": "application/vnd.github+json",
@@ -68,22 +88,56 @@ class GitHubREST:
             "X-GitHub-Api-Version": "2022-11-28",
         }
 
-    def _request(self, method: str, path: str, *, json_body: Any | None = None, params: dict[str, Any] | None = None) -> Any:
-        url = f"{self.api_base.rstrip('/')}{path}"
-        resp = requests.request(
+    def _send(
+        self,
+        method: str,
+        url: str,
+        *,
+        json_body: Any | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> requests.Response:
+        resp = request_with_retry(
+            self._session,
             method,
             url,
-            headers=self._headers(),
             json=json_body,
             params=params,
             timeout=self.timeout_s,
         )
         if resp.status_code >= 400:
-            raise GitHubAPIError(f"GitHub API error {resp.status_code} for {method} {path}: {resp.text}")
+            path = url.removeprefix(self.api_base.rstrip("/"))
+            raise GitHubAPIError(
+                f"GitHub API error {resp.status_code} for {method} {path}: {resp.text}"
+            )
+        return resp
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        json_body: Any | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> Any:
+        resp = self._send(
+            method, f"{self.api_base.rstrip('/')}{path}", json_body=json_body, params=params
+        )
         if resp.status_code == 204:
             return None
         return resp.json()
 
+    def _get_all_pages(self, path: str, *, params: dict[str, Any]) -> list[dict[str, Any]]:
+        """GET a list endpoint, following Link rel="next" so nothing past the first page is missed."""
+        items: list[dict[str, Any]] = []
+        url: str | None = f"{self.api_base.rstrip('/')}{path}"
+        query: dict[str, Any] | None = params
+        while url:
+            resp = self._send("GET", url, params=query)
+            items.extend(resp.json())
+            url = resp.links.get("next", {}).get("url")
+            query = None  # the next link already carries the query string
+        return items
+
     # Repo
     def get_repo(self) -> dict[str, Any]:
         return self._request("GET", f"/repos/{self.owner}/{self.repo}")
@@ -105,19 +159,32 @@ class GitHubREST:
             json_body={"labels": labs},
         )
 
+    def set_labels(self, number: int, labels: Iterable[str]) -> None:
+        """Replace all labels of an issue/PR in one call."""
+        self._request(
+            "PUT",
+            f"/repos/{self.owner}/{self.repo}/issues/{number}/labels",
+            json_body={"labels": [label for label in labels if label]},
+        )
+
     def remove_label(self, number: int, label: str) -> None:
         # label must be URL encoded; requests handles in URL? safer to replace spaces
         safe = label.replace(" ", "%20")
         self._request("DELETE", f"/repos/{self.owner}/{self.repo}/issues/{number}/labels/{safe}")
 
     def list_issue_comments(self, number: int, *, per_page: int = 100) -> list[dict[str, Any]]:
-        return self._request(
-            "GET",
+        cached = self._comments_cache.get(number)
+        if cached is not None:
+            return cached
+        comments = self._get_all_pages(
             f"/repos/{self.owner}/{self.repo}/issues/{number}/comments",
             params={"per_page": per_page},
         )
+        self._comments_cache[number] = comments
+        return comments
 
     def create_issue_comment(self, number: int, body: str) -> dict[str, Any]:
+        self._comments_cache.pop(number, None)
         return self._request(
             "POST",
             f"/repos/{self.owner}/{self.repo}/issues/{number}/comments",
@@ -128,14 +195,18 @@ class GitHubREST:
     def get_pull(self, pr_number: int) -> dict[str, Any]:
         return self._request("GET", f"/repos/{self.owner}/{self.repo}/pulls/{pr_number}")
 
-    def create_pull(self, *, title: str, body: str, head: str, base: str, draft: bool = False) -> dict[str, Any]:
+    def create_pull(
+        self, *, title: str, body: str, head: str, base: str, draft: bool = False
+    ) -> dict[str, Any]:
         return self._request(
             "POST",
             f"/repos/{self.owner}/{self.repo}/pulls",
             json_body={"title": title, "body": body, "head": head, "base": base, "draft": draft},
         )
 
-    def update_pull(self, pr_number: int, *, title: str | None = None, body: str | None = None) -> dict[str, Any]:
+    def update_pull(
+        self, pr_number: int, *, title: str | None = None, body: str | None = None
+    ) -> dict[str, Any]:
         payload: dict[str, Any] = {}
         if title is not None:
             payload["title"] = title
@@ -147,8 +218,14 @@ class GitHubREST:
             json_body=payload,
         )
 
-
-    def list_pulls(self, *, state: str = "open", head: str | None = None, base: str | None = None, per_page: int = 100) -> list[dict[str, Any]]:
+    def list_pulls(
+        self,
+        *,
+        state: str = "open",
+        head: str | None = None,
+        base: str | None = None,
+        per_page: int = 100,
+    ) -> list[dict[str, Any]]:
         params: dict[str, Any] = {"state": state, "per_page": per_page}
         if head:
             params["head"] = head
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def new_session(*, pool_maxsize: int = 8) -> requests.Session:
+    """Session with a keep-alive pool sized for the agent's parallel calls (patch attempts, lookups)."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def _rate_limited(resp: requests.Response) -> bool:
+    # GitHub answers primary/secondary rate limits with 403 (or 429) plus these headers
+    return resp.status_code == 429 or (
+        resp.status_code == 403
+        and ("Retry-After" in resp.headers or resp.headers.get("X-RateLimit-Remaining") == "0")
+    )
+
+
+def _server_delay(resp: requests.Response) -> float:
+    """Seconds the server asked us to wait (Retry-After / X-RateLimit-Reset), 0 if it didn't say."""
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return 0.0
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if reset and resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return float(reset) - time.time()
+        except ValueError:
+            return 0.0
+    return 0.0
+
+
+def request_with_retry(
+    session: requests.Session,
+    method: str,
+    url: str,
+    *,
+    attempts: int = 3,
+    idempotent: bool | None = None,
+    max_wait_s: float = 60.0,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Send a request, retrying only what can succeed on a second try:
+    rate limits always (the request was not processed), connection errors and 408/5xx only
+    for idempotent calls (by default: by HTTP method). Other 4xx come back at once.
+    Waits max(exponential backoff 1..8s, server hint), capped at max_wait_s;
+    a server hint longer than max_wait_s returns the response at once.
+    The last response is returned as is; status handling stays with the caller.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in _IDEMPOTENT_METHODS
+    attempt = 1
+    while True:
+        backoff = min(8.0, 2.0 ** (attempt - 1))
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= attempts or not idempotent:
+                raise
+            delay = backoff
+        else:
+            retryable = _rate_limited(resp) or (idempotent and resp.status_code in RETRY_STATUSES)
+            if attempt >= attempts or not retryable:
+                return resp
+            server_delay = _server_delay(resp)
+            if server_delay > max_wait_s:
+                # e.g. the hourly rate limit is spent: a retry within max_wait_s would fail the same way
+                return resp
+            delay = max(backoff, server_delay)
+            resp.close()
+        time.sleep(min(delay, max_wait_s))
+        attempt += 1
@@ -1,18 +1,44 @@
-
 from __future__ import annotations
 
 import os
+from collections.abc import Generator
+from pathlib import Path
+from typing import Protocol
 
 from ..settings import Settings
+from .cache import CachedLLM
 from .openai_chat import OpenAIChatLLM
 from .yandex_completion import YandexCompletionLLM
 
-__all__ = ["OpenAIChatLLM", "YandexCompletionLLM", "get_llm"]
+__all__ = ["CachedLLM", "LLMClient", "OpenAIChatLLM", "YandexCompletionLLM", "get_llm"]
+
+
+class LLMClient(Protocol):
+    def complete(self, *, system: str, user: str, temperature: float = 0.2) -> str: ...
+
+    def complete_stream(
+        self, *, system: str, user: str, temperature: float = 0.2
+    ) -> Generator[str, None, None]: ...
 
 
-def get_llm(settings: Settings):
+def get_llm(settings: Settings, *, prompt_cache_key: str | None = None) -> LLMClient:
     """
-    Returns an LLM client based on provider selection.
+    Returns an LLM client based on provider selection,
+    behind a disk cache for deterministic calls unless AGENT_LLM_CACHE is off.
+    prompt_cache_key groups calls sharing a prompt prefix (e.g. per repo) on providers that support it.
+    """
+    llm = _provider_llm(settings, prompt_cache_key=prompt_cache_key)
+    if not settings.llm_cache:
+        return llm
+    model = llm.model_uri if isinstance(llm, YandexCompletionLLM) else f"{llm.base_url}|{llm.model}"
+    return CachedLLM(llm, cache_dir=Path(settings.cache_dir) / "llm", model=model)
+
+
+def _provider_llm(
+    settings: Settings, *, prompt_cache_key: str | None
+) -> OpenAIChatLLM | YandexCompletionLLM:
+    """
+    Returns the provider's LLM client.
 
     Provider resolution order:
       1) settings.llm_provider (if exists)
@@ -20,19 +46,15 @@ def get_llm(settings: Settings):
       3) default "openai"
     """
     provider = (
-        getattr(settings, "llm_provider", None)
-        or os.getenv("LLM_PROVIDER")
-        or "openai"
-    ).lower().strip()
+        (getattr(settings, "llm_provider", None) or os.getenv("LLM_PROVIDER") or "openai")
+        .lower()
+        .strip()
+    )
 
     if provider == "yandex":
-        yandex_api_key = (
-            getattr(settings, "yandex_api_key", None)
-            or os.getenv("YANDEX_API_KEY")
-        )
-        yandex_model_uri = (
-            getattr(settings, "yandex_model_uri", None)
-            or os.getenv("YANDEX_MODEL_URI")
+        yandex_api_key = getattr(settings, "yandex_api_key", None) or os.getenv("YANDEX_API_KEY")
+        yandex_model_uri = getattr(settings, "yandex_model_uri", None) or os.getenv(
+            "YANDEX_MODEL_URI"
         )
 
         if not yandex_api_key:
@@ -44,16 +66,21 @@ def get_llm(settings: Settings):
         return YandexCompletionLLM(api_key=yandex_api_key, model_uri=yandex_model_uri)
 
     # default: openai
-    openai_key = (
-        getattr(settings, "openai_api_key", None)
-        or os.getenv("OPENAI_API_KEY")
-    )
+    openai_key = getattr(settings, "openai_api_key", None) or os.getenv("OPENAI_API_KEY")
     if not openai_key:
         raise RuntimeError("OPENAI_API_KEY is required when LLM_PROVIDER=openai")
 
+    base_url = (
+        getattr(settings, "openai_base_url", None)
+        or os.getenv("OPENAI_BASE_URL")
+        or "https://api.openai.com"
+    )
     return OpenAIChatLLM(
         api_key=openai_key,
         model=getattr(settings, "openai_model", None) or os.getenv("OPENAI_MODEL") or "gpt-4o-mini",
-        base_url=getattr(settings, "openai_base_url", None) or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com",
+        base_url=base_url,
+        # OpenAI-compatible proxies may reject unknown request fields
+        prompt_cache_key=(
+            prompt_cache_key if base_url.rstrip("/") == "https://api.openai.com" else None
+        ),
     )
-
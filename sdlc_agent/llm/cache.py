@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from collections.abc import Generator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import LLMClient
+
+# entries kept on disk (least recently used are pruned)
+MAX_CACHE_ENTRIES = 2_000
+
+
+@dataclass(frozen=True)
+class CachedLLM:
+    """
+    Disk cache in front of an LLM client for deterministic (temperature <= 0) completions.
+    A rerun of the same workflow gets e.g. the file selection from disk instead of a paid round-trip.
+
+    Streams are passed through: their consumers stop reading early (see code_agent._clean_patch),
+    and replaying a patch that was rejected would defeat the retry anyway.
+    Callers discard() an answer they cannot use, so a rerun asks the LLM again instead of replaying it.
+    """
+
+    llm: LLMClient
+    cache_dir: Path
+    model: str
+    max_entries: int = MAX_CACHE_ENTRIES
+
+    def _path(self, system: str, user: str, temperature: float) -> Path:
+        key = "\0".join((self.model, f"{temperature:.3f}", system, user))
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.txt"
+
+    def complete(self, *, system: str, user: str, temperature: float = 0.2) -> str:
+        if temperature > 0:
+            return self.llm.complete(system=system, user=user, temperature=temperature)
+
+        path = self._path(system, user, temperature)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)
+            return text
+        except OSError:
+            pass
+
+        text = self.llm.complete(system=system, user=user, temperature=temperature)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # write-then-rename: a concurrent run never reads a half-written entry
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+            self._prune()
+        except OSError:
+            pass  # the cache is best-effort
+        return text
+
+    def discard(self, *, system: str, user: str, temperature: float = 0.2) -> None:
+        """Forget the cached answer to this prompt (e.g. one the caller failed to parse)."""
+        self._path(system, user, temperature).unlink(missing_ok=True)
+
+    def _prune(self) -> None:
+        entries = list(self.cache_dir.glob("*/*.txt"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        for old in entries[: len(entries) - self.max_entries]:
+            old.unlink(missing_ok=True)
+
+    def complete_stream(
+        self, *, system: str, user: str, temperature: float = 0.2
+    ) -> Generator[str, None, None]:
+        return self.llm.complete_stream(system=system, user=user, temperature=temperature)
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from collections.abc import Generator
+from dataclasses import dataclass, field
 from typing import Any
 
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+
+from ..http_utils import new_session, request_with_retry
 
 
 class LLMError(RuntimeError):
@@ -18,28 +20,71 @@ class OpenAIChatLLM:
     model: str = "gpt-4o-mini"
     base_url: str = "https://api.openai.com"
     timeout_s: int = 60
+    # routes requests with a shared prompt prefix to the same cache (OpenAI prompt caching)
+    prompt_cache_key: str | None = None
+    # reused across retries and calls: no TCP/TLS handshake per request
+    _session: requests.Session = field(
+        default_factory=new_session, init=False, repr=False, compare=False
+    )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-    def chat(self, messages: list[dict[str, Any]], *, temperature: float = 0.2) -> str:
+    def _post(
+        self, messages: list[dict[str, Any]], *, temperature: float, stream: bool
+    ) -> requests.Response:
         url = f"{self.base_url.rstrip('/')}/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
         }
-        payload = {
+        payload: dict[str, Any] = {
             "model": self.model,
             "messages": messages,
             "temperature": temperature,
         }
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=self.timeout_s)
+        if stream:
+            payload["stream"] = True
+        if self.prompt_cache_key:
+            payload["prompt_cache_key"] = self.prompt_cache_key
+        # no side effects: safe to retry connection errors and 5xx too
+        resp = request_with_retry(
+            self._session,
+            "POST",
+            url,
+            idempotent=True,
+            headers=headers,
+            json=payload,
+            timeout=self.timeout_s,
+            stream=stream,
+        )
         if resp.status_code >= 400:
             raise LLMError(f"OpenAI API error {resp.status_code}: {resp.text}")
-        data = resp.json()
+        return resp
+
+    def chat(self, messages: list[dict[str, Any]], *, temperature: float = 0.2) -> str:
+        data = self._post(messages, temperature=temperature, stream=False).json()
         try:
             return data["choices"][0]["message"]["content"]
         except Exception as e:
             raise LLMError(f"Unexpected OpenAI response format: {data}") from e
 
+    def chat_stream(
+        self, messages: list[dict[str, Any]], *, temperature: float = 0.2
+    ) -> Generator[str, None, None]:
+        """Yield content deltas as the model generates them (server-sent events).
+        Closing the iterator early closes the connection and stops paying for the rest."""
+        with self._post(messages, temperature=temperature, stream=True) as resp:
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = line[len("data:") :].strip()
+                if event == "[DONE]":
+                    return
+                try:
+                    choices = json.loads(event).get("choices") or []
+                except ValueError as e:
+                    raise LLMError(f"Unexpected OpenAI stream event: {event}") from e
+                if choices and (delta := (choices[0].get("delta") or {}).get("content")):
+                    yield delta
+
     def complete(self, *, system: str, user: str, temperature: float = 0.2) -> str:
         return self.chat(
             [
@@ -48,3 +93,14 @@ class OpenAIChatLLM:
             ],
             temperature=temperature,
         )
+
+    def complete_stream(
+        self, *, system: str, user: str, temperature: float = 0.2
+    ) -> Generator[str, None, None]:
+        return self.chat_stream(
+            [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=temperature,
+        )
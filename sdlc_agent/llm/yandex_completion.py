@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from collections.abc import Generator
+from dataclasses import dataclass, field
 from typing import Any
 
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+
+from ..http_utils import new_session, request_with_retry
 
 
 class LLMError(RuntimeError):
@@ -19,14 +21,18 @@ class YandexCompletionLLM:
     base_url: str = "https://llm.api.cloud.yandex.net"
     timeout_s: int = 60
     max_tokens: int = 2048
+    # reused across retries and calls: no TCP/TLS handshake per request
+    _session: requests.Session = field(
+        default_factory=new_session, init=False, repr=False, compare=False
+    )
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
-    def chat(self, messages: list[dict[str, Any]], *, temperature: float = 0.2) -> str:
+    def _post(
+        self, messages: list[dict[str, Any]], *, temperature: float, stream: bool
+    ) -> requests.Response:
         url = f"{self.base_url.rstrip('/')}/foundationModels/v1/completion"
         headers = {
             # Yandex AI Studio API key auth
             "Authorization": f"Api-Key {self.api_key}",
-            "Content-Type": "application/json",
         }
 
         yc_messages: list[dict[str, str]] = []
@@ -40,24 +46,60 @@ class YandexCompletionLLM:
         payload = {
             "modelUri": self.model_uri,
             "completionOptions": {
-                "stream": False,
+                "stream": stream,
                 "temperature": float(temperature),
                 "maxTokens": str(self.max_tokens),
             },
             "messages": yc_messages,
         }
 
-        resp = requests.post(url, headers=headers, data=json.dumps(payload), timeout=self.timeout_s)
+        # no side effects: safe to retry connection errors and 5xx too
+        resp = request_with_retry(
+            self._session,
+            "POST",
+            url,
+            idempotent=True,
+            headers=headers,
+            json=payload,
+            timeout=self.timeout_s,
+            stream=stream,
+        )
         if resp.status_code >= 400:
             raise LLMError(f"YandexGPT API error {resp.status_code}: {resp.text}")
+        return resp
 
-        data = resp.json()
+    @staticmethod
+    def _alternative_text(data: Any) -> str:
         try:
-            result = data.get("result", data)  
+            result = data.get("result", data)
             return result["alternatives"][0]["message"]["text"]
-        except Exception as e: 
+        except Exception as e:
             raise LLMError(f"Unexpected YandexGPT response format: {data}") from e
 
+    def chat(self, messages: list[dict[str, Any]], *, temperature: float = 0.2) -> str:
+        data = self._post(messages, temperature=temperature, stream=False).json()
+        return self._alternative_text(data)
+
+    def chat_stream(
+        self, messages: list[dict[str, Any]], *, temperature: float = 0.2
+    ) -> Generator[str, None, None]:
+        """Yield text deltas as the model generates them.
+        The API streams JSON lines with the cumulative text so far; only the new suffix is yielded.
+        """
+        seen = 0
+        with self._post(messages, temperature=temperature, stream=True) as resp:
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    raise LLMError(f"Unexpected YandexGPT stream line: {line}") from e
+                text = self._alternative_text(data)
+                if len(text) > seen:
+                    yield text[seen:]
+                    seen = len(text)
 
     def complete(self, *, system: str, user: str, temperature: float = 0.2) -> str:
         return self.chat(
@@ -67,3 +109,14 @@ class YandexCompletionLLM:
             ],
             temperature=temperature,
         )
+
+    def complete_stream(
+        self, *, system: str, user: str, temperature: float = 0.2
+    ) -> Generator[str, None, None]:
+        return self.chat_stream(
+            [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=temperature,
+        )
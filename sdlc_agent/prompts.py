@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import io
 from dataclasses import dataclass
 from textwrap import dedent
 
@@ -37,68 +38,134 @@ REVIEWER_SYSTEM = dedent(
 ).strip()
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class IssueContext:
     number: int
     title: str
     body: str
 
 
-def build_file_select_prompt(issue: IssueContext, all_files: list[str]) -> str:
-    file_list = "\n".join(f"- {p}" for p in all_files)
-    return dedent(
-        f"""        Issue #{issue.number}: {issue.title}
+# Templates are dedented once at import; the builders only fill them in with format_map.
+# Static part first (instructions, then the repo listing / file contents), the issue and feedback last:
+# consecutive calls share the longest possible prefix for provider-side prompt caching.
+_FILE_SELECT_TMPL = dedent(
+    """    Ниже список файлов репозитория и Issue. Выбери МАКСИМУМ 8 файлов, которые нужно прочитать, чтобы решить задачу.
+    Если задача простая и очевидная — всё равно выбери 1-3 наиболее релевантных файла.
 
-        Описание:
-        {issue.body}
+    Верни СТРОГО JSON (без markdown), формат:
+    {{
+      "files": ["path1", "path2", "..."],
+      "primary": ["path1"],
+      "reason": "коротко почему эти файлы"
+    }}
+    В "primary" перечисли файлы из "files", которые придётся изменить: они придут целиком,
+    остальные большие Python-файлы — только сигнатурами.
 
-        Ниже список файлов репозитория. Выбери МАКСИМУМ 8 файлов, которые нужно прочитать, чтобы решить задачу.
-        Если задача простая и очевидная — всё равно выбери 1-3 наиболее релевантных файла.
+    Список файлов:
+    {file_list}
 
-        Верни СТРОГО JSON (без markdown), формат:
-        {{
-          "files": ["path1", "path2", "..."],
-          "reason": "коротко почему эти файлы"
-        }}
+    Issue #{number}: {title}
 
-        Список файлов:
-        {file_list}
-        """
-    ).strip()
+    Описание:
+    {body}
+    """
+).strip()
 
+_PATCH_TMPL = dedent(
+    """    Ниже — содержимое выбранных файлов и Issue.
+    Сгенерируй ПАТЧ в формате unified diff (git), чтобы решить задачу.
 
-def build_patch_prompt(issue: IssueContext, files_with_content: dict[str, str], feedback: str | None) -> str:
-    parts: list[str] = []
-    for path, content in files_with_content.items():
-        parts.append(f"--- FILE: {path} ---\n{content}\n--- END FILE: {path} ---\n")
-    files_blob = "\n".join(parts)
+    Ограничения:
+    - Меняй минимум файлов.
+    - Не трогай .github/workflows, если Issue явно не про это.
+    - Патч должен применяться командой `git apply`.
+    - В diff должны быть строки вида `diff --git a/... b/...`.
+    - Файлы с пометкой <OUTLINE ONLY> показаны только сигнатурами: используй их как справку, не меняй их.
+
+    Ответ:
+    - Сначала короткий план (до 5 буллетов).
+    - Затем ОДИН блок кода ```diff ...```.
+
+    Файлы:
+    {files_blob}
+
+    Issue #{number}: {title}
+
+    Описание:
+    {body}{feedback}
+    """
+).strip()
+
+_REVIEW_TMPL = dedent(
+    """    Проверь PR по Issue, результатам CI и diff ниже.
+
+    Верни СТРОГО JSON (без markdown), формат:
+    {{
+      "needs_changes": true/false,
+      "summary_md": "короткий итог (1-3 предложения)",
+      "review_md": "подробный review в markdown (чеклист, замечания, рекомендации)",
+      "action_items": ["...", "..."],
+      "confidence": 0.0-1.0
+    }}
+
+    Подсказка:
+    - needs_changes=true, если CI не зелёный ИЛИ требования Issue не выполнены.
+    - Если уверенность низкая, укажи это в confidence и проси минимальные уточнения в action_items.
+
+    Issue #{number}: {title}
+
+    Issue body:
+    {body}
 
-    fb = "" if not feedback else f"\n\nДоп. замечания от ревьюера (учти их!):\n{feedback}\n"
+    PR title: {pr_title}
 
-    return dedent(
-        f"""        Issue #{issue.number}: {issue.title}
+    PR body:
+    {pr_body}
 
-        Описание:
-        {issue.body}
-        {fb}
+    CI summary:
+    {ci_summary}
 
-        Ниже — содержимое выбранных файлов.
-        Сгенерируй ПАТЧ в формате unified diff (git), чтобы решить задачу.
+    CI logs (tail):
+    {ci_logs_tail}
 
-        Ограничения:
-        - Меняй минимум файлов.
-        - Не трогай .github/workflows, если Issue явно не про это.
-        - Патч должен применяться командой `git apply`.
-        - В diff должны быть строки вида `diff --git a/... b/...`.
+    PR diff:
+    {diff}
+    """
+).strip()
+
+
+def build_file_select_prompt(issue: IssueContext, all_files: list[str]) -> str:
+    # one join, no per-path f-string
+    file_list = "- " + "\n- ".join(all_files) if all_files else ""
+    return _FILE_SELECT_TMPL.format_map(
+        {"file_list": file_list, "number": issue.number, "title": issue.title, "body": issue.body}
+    )
 
-        Ответ:
-        - Сначала короткий план (до 5 буллетов).
-        - Затем ОДИН блок кода ```diff ...```.
 
-        Файлы:
-        {files_blob}
-        """
-    ).strip()
+def build_patch_prompt(
+    issue: IssueContext, files_with_content: dict[str, str], feedback: str | None
+) -> str:
+    # written straight into one buffer: no per-file string, no join copy
+    buf = io.StringIO()
+    for path, content in files_with_content.items():
+        if buf.tell():
+            buf.write("\n")
+        buf.write(f"--- FILE: {path} ---\n")
+        buf.write(content)
+        buf.write(f"\n--- END FILE: {path} ---\n")
+    files_blob = buf.getvalue()
+
+    fb = "" if not feedback else f"\n\nДоп. замечания от ревьюера (учти их!):\n{feedback}"
+
+    return _PATCH_TMPL.format_map(
+        {
+            "files_blob": files_blob,
+            "number": issue.number,
+            "title": issue.title,
+            "body": issue.body,
+            "feedback": fb,
+        }
+    )
 
 
 def build_review_prompt(
@@ -110,37 +177,15 @@ def build_review_prompt(
     ci_summary: str,
     ci_logs_tail: str,
 ) -> str:
-    return dedent(
-        f"""        Issue #{issue.number}: {issue.title}
-
-        Issue body:
-        {issue.body}
-
-        PR title: {pr_title}
-
-        PR body:
-        {pr_body}
-
-        CI summary:
-        {ci_summary}
-
-        CI logs (tail):
-        {ci_logs_tail}
-
-        PR diff:
-        {diff}
-
-        Верни СТРОГО JSON (без markdown), формат:
-        {{
-          "needs_changes": true/false,
-          "summary_md": "короткий итог (1-3 предложения)",
-          "review_md": "подробный review в markdown (чеклист, замечания, рекомендации)",
-          "action_items": ["...", "..."],
-          "confidence": 0.0-1.0
-        }}
-
-        Подсказка:
-        - needs_changes=true, если CI не зелёный ИЛИ требования Issue не выполнены.
-        - Если уверенность низкая, укажи это в confidence и проси минимальные уточнения в action_items.
-        """
-    ).strip()
+    return _REVIEW_TMPL.format_map(
+        {
+            "number": issue.number,
+            "title": issue.title,
+            "body": issue.body,
+            "pr_title": pr_title,
+            "pr_body": pr_body,
+            "ci_summary": ci_summary,
+            "ci_logs_tail": ci_logs_tail,
+            "diff": diff,
+        }
+    )
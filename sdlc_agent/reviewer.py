@@ -1,57 +1,72 @@
 from __future__ import annotations
 
+import io
 import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from rich.console import Console
 from rich.panel import Panel
 
-from .git_utils import git
+from .git_utils import git_stdout_head
 from .github_api import GitHubREST, normalize_repo
 from .llm import get_llm
-from .prompts import IssueContext, build_review_prompt
+from .prompts import REVIEWER_SYSTEM, IssueContext, build_review_prompt
 from .settings import Settings
-from .state import AgentLabels, get_iteration
+from .state import LABELS, get_iteration
 from .text_utils import extract_first_json
 
 console = Console()
 
 AGENT_REVIEW_MARKER = "<!--sdlc-agent-review-->"
 
+# the pattern is pure ASCII: ASCII mode keeps \s and \d to their ASCII sets
+_CLOSES_RE = re.compile(r"Closes\s+#(\d+)", re.IGNORECASE | re.ASCII)
+
+# prompt budgets (chars): the diff head and the CI log tails
+DIFF_BUDGET = 120_000
+CI_LOGS_BUDGET = 60_000
+CI_TAIL_PER_JOB = 2_000
+
 
 def _find_issue_number_in_pr_body(pr_body: str) -> int | None:
-    m = re.search(r"Closes\s+#(\d+)", pr_body, flags=re.IGNORECASE)
+    m = _CLOSES_RE.search(pr_body)
     return int(m.group(1)) if m else None
 
 
 def _load_ci_results(ci_results_path: Path | None) -> dict:
     if not ci_results_path:
         return {}
-    if not ci_results_path.exists():
+    try:
+        # json.loads decodes UTF-8 bytes itself: no intermediate str copy of the file
+        return json.loads(ci_results_path.read_bytes())
+    except FileNotFoundError:
         return {}
-    return json.loads(ci_results_path.read_text(encoding="utf-8"))
 
 
 def _summarize_ci(ci: dict) -> tuple[str, str, bool]:
-    """Return (summary, logs_tail, is_green)."""
+    """Return (summary, logs_tail, is_green); logs_tail holds the failed jobs only."""
     if not ci:
         return ("(нет данных)", "", True)
 
-    lines = []
-    tails = []
+    summary = io.StringIO()
+    tails = io.StringIO()
     green = True
+    # each job's tail is cut to its share up front, the joined logs fit the budget without another slice
+    per_job = min(CI_TAIL_PER_JOB, CI_LOGS_BUDGET // len(ci))
     for name, info in ci.items():
         code = info.get("exit_code")
         outcome = "✅" if code == 0 else "❌"
         if code != 0:
             green = False
-        lines.append(f"- {outcome} **{name}** (exit={code})")
-        tail = info.get("log_tail") or ""
+        summary.write(f"- {outcome} **{name}** (exit={code})\n")
+        # logs of passing jobs tell the reviewer nothing the summary line doesn't
+        tail = (info.get("log_tail") or "") if code != 0 else ""
         if tail:
-            tails.append(f"## {name}\n```\n{tail[-2000:]}\n```")
-    return ("\n".join(lines), "\n\n".join(tails), green)
+            tails.write(f"## {name}\n```\n{tail[-per_job:]}\n```\n\n")
+    return (summary.getvalue().rstrip("\n"), tails.getvalue().rstrip("\n"), green)
 
 
 def run_pr_review(
@@ -62,19 +77,40 @@ def run_pr_review(
     settings: Settings,
     ci_results_path: Path | None = None,
 ) -> None:
-    repo_full_name = normalize_repo(repo)
-    gh = GitHubREST(token=settings.github_token, repo_full_name=repo_full_name, api_base=settings.github_api_base)
+    with GitHubREST(
+        token=settings.github_token,
+        repo_full_name=normalize_repo(repo),
+        api_base=settings.github_api_base,
+    ) as gh:
+        _run_pr_review(
+            gh,
+            pr_number=pr_number,
+            repo_dir=repo_dir,
+            settings=settings,
+            ci_results_path=ci_results_path,
+        )
+
+
+def _run_pr_review(
+    gh: GitHubREST,
+    *,
+    pr_number: int,
+    repo_dir: Path,
+    settings: Settings,
+    ci_results_path: Path | None,
+) -> None:
+    repo_full_name = gh.repo_full_name
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        viewer_future = ex.submit(gh.viewer_login)
+        pr = gh.get_pull(pr_number)
+        reviewer_login = viewer_future.result()
 
-    pr = gh.get_pull(pr_number)
-    
     pr_body = pr.get("body") or ""
     pr_title = pr.get("title") or f"PR #{pr_number}"
 
     pr_author = str((pr.get("user") or {}).get("login") or "")
-    reviewer_login = gh.viewer_login()
 
     if pr_author and reviewer_login and pr_author.lower() == reviewer_login.lower():
-        labels = AgentLabels()
         msg = (
             " **Self-review запрещён** (Reviewer и автор PR — один и тот же аккаунт).\n\n"
             f"- PR author: `{pr_author}`\n"
@@ -83,8 +119,8 @@ def run_pr_review(
             "Останавливаю авто-цикл."
         )
         gh.create_issue_comment(pr_number, msg)
-        gh.add_labels(pr_number, [labels.stopped])
-        _safe_remove_label(gh, pr_number, labels.fix)
+        gh.add_labels(pr_number, [LABELS.stopped])
+        _safe_remove_label(gh, pr_number, LABELS.fix)
 
         step_summary_path = os.getenv("GITHUB_STEP_SUMMARY")
         if step_summary_path:
@@ -92,40 +128,44 @@ def run_pr_review(
 
         return
 
-
-
     issue_number = _find_issue_number_in_pr_body(pr_body)
     if not issue_number:
         raise RuntimeError("Cannot find Issue number in PR body (expected 'Closes #<n>')")
 
-    issue = gh.get_issue(issue_number)
-    issue_ctx = IssueContext(number=issue_number, title=issue.get("title", ""), body=issue.get("body") or "")
-
-    # CI results
-    ci = _load_ci_results(ci_results_path)
-    ci_summary, ci_logs_tail, ci_green = _summarize_ci(ci)
-
-    # Diff from git (requires fetch-depth 0 in Actions)
     base_sha = pr.get("base", {}).get("sha")
     head_sha = pr.get("head", {}).get("sha")
     if not base_sha or not head_sha:
         raise RuntimeError("Missing base/head SHA in PR payload")
 
-    diff_res = git(["diff", f"{base_sha}...{head_sha}"], cwd=repo_dir, check=False)
-    diff = diff_res.stdout.strip()
-    if not diff:
-        diff = "(diff пуст)"
+    # the issue is fetched while CI results and the diff are read locally
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        issue_future = ex.submit(gh.get_issue, issue_number)
+
+        # CI results
+        ci = _load_ci_results(ci_results_path)
+        ci_summary, ci_logs_tail, ci_green = _summarize_ci(ci)
 
+        # Diff from git (requires fetch-depth 0 in Actions)
+        diff = git_stdout_head(
+            ["diff", f"{base_sha}...{head_sha}"], cwd=repo_dir, max_chars=DIFF_BUDGET
+        ).strip()
+        if not diff:
+            diff = "(diff пуст)"
 
-    llm = get_llm(settings)
+        issue = issue_future.result()
+    issue_ctx = IssueContext(
+        number=issue_number, title=issue.get("title", ""), body=issue.get("body") or ""
+    )
+
+    llm = get_llm(settings, prompt_cache_key=f"sdlc-{repo_full_name}")
 
     prompt = build_review_prompt(
         issue=issue_ctx,
         pr_title=pr_title,
         pr_body=pr_body,
-        diff=diff[:120_000],
+        diff=diff,
         ci_summary=ci_summary,
-        ci_logs_tail=ci_logs_tail[:60_000],
+        ci_logs_tail=ci_logs_tail,
     )
 
     console.print(
@@ -135,7 +175,7 @@ def run_pr_review(
         )
     )
 
-    raw = llm.complete(system="Ты пишешь строго JSON review.", user=prompt, temperature=0.1)
+    raw = llm.complete(system=REVIEWER_SYSTEM, user=prompt, temperature=0.1)
     data = extract_first_json(raw)
 
     needs_changes = bool(data.get("needs_changes", False))
@@ -153,16 +193,15 @@ def run_pr_review(
     event = "REQUEST_CHANGES" if needs_changes else "APPROVE"
 
     # Labels / iteration limit
-    labels = AgentLabels()
-    pr_issue = gh.get_issue(pr_number)
-    pr_labels = [label["name"] for label in pr_issue.get("labels", [])]
+    # the pull payload carries the labels too: no second request for the PR as an issue
+    pr_labels = [label["name"] for label in pr.get("labels") or []]
     cur_iter = get_iteration(pr_labels)
     max_iters = settings.max_iters
 
     if needs_changes and cur_iter >= max_iters:
         needs_changes = False  # stop auto loop
         event = "COMMENT"
-        gh.add_labels(pr_number, [labels.stopped])
+        gh.add_labels(pr_number, [LABELS.stopped])
         review_md = (
             f" Лимит итераций достигнут ({max_iters}). Авто-исправления остановлены.\n\n"
             + review_md
@@ -177,30 +216,36 @@ def run_pr_review(
         )
 
     # 2) PR issue comment (machine readable JSON at end)
-    comment_body = (
-        f"## 🤖 AI Reviewer\n\n"
-        f"**needs_changes:** `{needs_changes}`\n\n"
-        f"{summary_md}\n\n"
-        f"{review_md}\n\n"
-        f"### Action items\n"
-        + "\n".join(f"- {x}" for x in (action_items if isinstance(action_items, list) else []))
-        + f"\n\nConfidence: `{confidence}`\n\n"
-        f"{AGENT_REVIEW_MARKER}\n"
-        f"```json\n{json.dumps(data, ensure_ascii=False, indent=2)}\n```\n"
-    )
-    gh.create_issue_comment(pr_number, comment_body)
-
-    # 3) PR review object (Approve / Request changes)
-    gh.create_pull_review(pr_number, body=review_md or summary_md or "AI review", event=event)
+    buf = io.StringIO()
+    buf.write(f"## 🤖 AI Reviewer\n\n**needs_changes:** `{needs_changes}`\n\n")
+    buf.write(f"{summary_md}\n\n{review_md}\n\n### Action items\n")
+    for item in action_items if isinstance(action_items, list) else []:
+        buf.write(f"- {item}\n")
+    buf.write(f"\nConfidence: `{confidence}`\n\n{AGENT_REVIEW_MARKER}\n```json\n")
+    json.dump(data, buf, ensure_ascii=False, indent=2)
+    buf.write("\n```\n")
+    comment_body = buf.getvalue()
+
+    # 3) PR review object (Approve / Request changes), posted alongside the comment
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        review_future = ex.submit(
+            gh.create_pull_review,
+            pr_number,
+            body=review_md or summary_md or "AI review",
+            event=event,
+        )
+        gh.create_issue_comment(pr_number, comment_body)
 
+        # agent:fix triggers run_fix, which reads the comment above: label only once it is posted
+        if needs_changes:
+            gh.add_labels(pr_number, [LABELS.fix])
 
-    if needs_changes:
-        gh.add_labels(pr_number, [labels.fix])
+            _safe_remove_label(gh, pr_number, LABELS.done)
+        else:
+            gh.add_labels(pr_number, [LABELS.done])
+            _safe_remove_label(gh, pr_number, LABELS.fix)
 
-        _safe_remove_label(gh, pr_number, labels.done)
-    else:
-        gh.add_labels(pr_number, [labels.done])
-        _safe_remove_label(gh, pr_number, labels.fix)
+        review_future.result()
 
     console.print(f"[green]Review submitted[/green]. Event={event}, needs_changes={needs_changes}")
 
@@ -210,4 +255,3 @@ def _safe_remove_label(gh: GitHubREST, number: int, label: str) -> None:
         gh.remove_label(number, label)
     except Exception:
         return
-
@@ -2,10 +2,20 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from typing import Literal
+from pathlib import Path
+from typing import ClassVar, Literal
 
+DEFAULT_CACHE_DIR = str(Path.home() / ".cache" / "sdlc-agent")
 
-@dataclass(frozen=True)
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("", "0", "false", "no", "off")
+
+
+@dataclass(frozen=True, slots=True)
 class Settings:
     """Runtime configuration loaded from environment variables."""
 
@@ -21,21 +31,46 @@ class Settings:
     # Agent behavior
     max_iters: int = 3
     base_branch: str | None = None
+    llm_concurrency: int = 1
+    partial_clone: bool = True
+    cache_dir: str = DEFAULT_CACHE_DIR
+    llm_cache: bool = True
 
     # Git identity for automated commits
     git_user_name: str = "sdlc-agent[bot]"
     git_user_email: str = "sdlc-agent[bot]@users.noreply.github.com"
 
+    # from_env result per actor; the environment is read once per process
+    _env_cache: ClassVar[dict[str, Settings]] = {}
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Forget cached from_env results (after changing the environment, e.g. in tests)."""
+        cls._env_cache.clear()
+
     @classmethod
     def from_env(cls, *, actor: Literal["code", "reviewer"] = "code") -> Settings:
+        cached = cls._env_cache.get(actor)
+        if cached is not None:
+            return cached
+
         if actor == "code":
-            token = os.getenv("CODE_AGENT_GITHUB_TOKEN") or os.getenv("AGENT_GITHUB_TOKEN") or os.getenv("GITHUB_TOKEN")
+            token = (
+                os.getenv("CODE_AGENT_GITHUB_TOKEN")
+                or os.getenv("AGENT_GITHUB_TOKEN")
+                or os.getenv("GITHUB_TOKEN")
+            )
         else:
-            token = os.getenv("REVIEWER_GITHUB_TOKEN") or os.getenv("GITHUB_TOKEN") or os.getenv("AGENT_GITHUB_TOKEN")
+            token = (
+                os.getenv("REVIEWER_GITHUB_TOKEN")
+                or os.getenv("GITHUB_TOKEN")
+                or os.getenv("AGENT_GITHUB_TOKEN")
+            )
 
         max_iters = int(os.getenv("AGENT_MAX_ITERS", "3"))
+        llm_concurrency = max(1, int(os.getenv("AGENT_LLM_CONCURRENCY", "1")))
 
-        return cls(
+        settings = cls(
             github_token=token,
             github_api_base=os.getenv("GITHUB_API_BASE", "https://api.github.com"),
             openai_api_key=os.getenv("OPENAI_API_KEY"),
@@ -43,8 +78,12 @@ class Settings:
             openai_model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
             max_iters=max_iters,
             base_branch=os.getenv("AGENT_BASE_BRANCH"),
+            llm_concurrency=llm_concurrency,
+            partial_clone=_env_flag("AGENT_PARTIAL_CLONE", True),
+            cache_dir=os.getenv("AGENT_CACHE_DIR") or DEFAULT_CACHE_DIR,
+            llm_cache=_env_flag("AGENT_LLM_CACHE", True),
             git_user_name=os.getenv("AGENT_GIT_NAME", "sdlc-agent[bot]"),
-            git_user_email=os.getenv(
-                "AGENT_GIT_EMAIL", "sdlc-agent[bot]@users.noreply.github.com"
-            ),
+            git_user_email=os.getenv("AGENT_GIT_EMAIL", "sdlc-agent[bot]@users.noreply.github.com"),
         )
+        cls._env_cache[actor] = settings
+        return settings
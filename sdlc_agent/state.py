@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import re
 from dataclasses import dataclass
 
 LABEL_MANAGED = "agent:managed"
@@ -9,10 +8,10 @@ LABEL_DONE = "agent:done"
 LABEL_STOPPED = "agent:stopped"
 ITER_PREFIX = "agent:iter-"
 
-_ITER_RE = re.compile(r"^agent:iter-(\d+)$")
+_ITER_PREFIX_LEN = len(ITER_PREFIX)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class AgentLabels:
     managed: str = LABEL_MANAGED
     fix: str = LABEL_FIX
@@ -23,14 +22,22 @@ class AgentLabels:
         return f"{ITER_PREFIX}{n}"
 
 
+# the label names are constants: one shared instance
+LABELS = AgentLabels()
+
+
 def get_iteration(labels: list[str]) -> int:
-    iters = []
+    best = 0
     for lab in labels:
-        m = _ITER_RE.match(lab)
-        if m:
-            iters.append(int(m.group(1)))
-    return max(iters) if iters else 0
+        if lab.startswith(ITER_PREFIX):
+            suffix = lab[_ITER_PREFIX_LEN:]
+            # digits only: 'agent:iter-' or 'agent:iter-x' are not iteration labels
+            if suffix.isdecimal():
+                best = max(best, int(suffix))
+    return best
 
 
 def iter_labels(labels: list[str]) -> list[str]:
-    return [lab for lab in labels if _ITER_RE.match(lab)]
+    return [
+        lab for lab in labels if lab.startswith(ITER_PREFIX) and lab[_ITER_PREFIX_LEN:].isdecimal()
+    ]
@@ -5,16 +5,28 @@ import re
 from typing import Any
 
 _JSON_CODEBLOCK_RE = re.compile(r"```json\s*(?P<body>\{.*?\})\s*```", re.DOTALL)
-_ANY_CODEBLOCK_RE = re.compile(
-    r"```(?P<lang>[a-zA-Z0-9_-]+)?\s*(?P<body>.*?)\s*```", re.DOTALL
-)
+_LANG_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+_JSON_SCAN_RE = re.compile(r'[{}"\\]')
+_MAX_JSON_CHARS = 200_000
+_DECODER = json.JSONDecoder()
 
 
 def extract_codeblock(text: str, *, lang: str) -> str | None:
     """Return the first fenced code block body for a given language."""
-    for match in _ANY_CODEBLOCK_RE.finditer(text):
-        if (match.group("lang") or "").strip().lower() == lang.lower():
-            return match.group("body").strip()
+    lang = lang.lower()
+    # fences pair up in order (open, close, open, ...); only the opening fence's tag is inspected
+    open_at = text.find("```")
+    while open_at != -1:
+        start = open_at + 3
+        close_at = text.find("```", start)
+        if close_at == -1:
+            return None
+        end = start
+        while end < close_at and text[end] in _LANG_CHARS:
+            end += 1
+        if text[start:end].lower() == lang:
+            return text[end:close_at].strip()
+        open_at = text.find("```", close_at + 3)
     return None
 
 
@@ -27,27 +39,71 @@ def extract_first_json(text: str) -> Any:
 
     Raises ValueError if nothing usable found.
     """
+    # the prompts ask for bare JSON: try it as is before any scanning
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+
     m = _JSON_CODEBLOCK_RE.search(text)
     if m:
         return json.loads(m.group("body"))
 
-
-    for m2 in re.finditer(r"\{", text):
-        start = m2.start()
-        for end in range(len(text) - 1, start, -1):
-            if text[end] != "}":
-                continue
-            snippet = text[start : end + 1]
-            if len(snippet) > 200_000:
-                continue
+    # candidates are the balanced {...} spans (outermost first), found in one scan
+    tried: set[int] = set()
+    for start, end in _brace_spans(text):
+        if end - start > _MAX_JSON_CHARS:
+            continue
+        tried.add(start)
+        try:
+            # parse in place: no copy of the candidate span
+            return _DECODER.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            continue
+
+    # a stray quote in non-JSON braces throws the scan's string state off: try every other '{'
+    start = text.find("{")
+    while start != -1:
+        if start not in tried:
             try:
-                return json.loads(snippet)
+                return _DECODER.raw_decode(text, start)[0]
             except json.JSONDecodeError:
-                continue
+                pass
+        start = text.find("{", start + 1)
 
     raise ValueError("Could not extract valid JSON from text")
 
 
+def _brace_spans(text: str) -> list[tuple[int, int]]:
+    """(start, end) of every balanced {...} in text, by start; braces inside JSON strings don't count."""
+    spans: list[tuple[int, int]] = []
+    opened: list[int] = []
+    in_string = False
+    escaped_until = 0
+    # the regex engine skips the plain text in C; Python only sees braces, quotes and backslashes
+    for m in _JSON_SCAN_RE.finditer(text):
+        i = m.start()
+        if i < escaped_until:
+            continue
+        ch = m.group()
+        if in_string:
+            if ch == "\\":
+                escaped_until = i + 2
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # quotes in prose outside any braces are not JSON strings
+            in_string = bool(opened)
+        elif ch == "{":
+            opened.append(i)
+        elif ch == "}" and opened:
+            spans.append((opened.pop(), i + 1))
+    spans.sort()
+    return spans
+
+
 def extract_unified_diff(text: str) -> str:
     """Extract unified diff from LLM output.
 
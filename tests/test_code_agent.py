@@ -0,0 +1,393 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from sdlc_agent import code_agent
+from sdlc_agent.code_agent import (
+    _apply_llm_patch,
+    _clean_patch,
+    _ensure_repo_dir,
+    _evict_cached_repos,
+    _find_files_in_pr_body,
+    _rank_files,
+    _read_files,
+    _select_files,
+    _shorten,
+    _tracked_only,
+)
+from sdlc_agent.git_utils import CommandError, git
+from sdlc_agent.llm import CachedLLM
+from sdlc_agent.prompts import IssueContext
+
+
+def test_clean_patch_strips_text_and_keeps_first_block():
+    raw = """plan:
+- change foo
+```diff
+diff --git a/foo.txt b/foo.txt
+--- a/foo.txt
++++ b/foo.txt
+@@ -1 +1 @@
+this line is chatter
+-hello
++hi
+diff --git a/bar.txt b/bar.txt
+--- a/bar.txt
++++ b/bar.txt
+```
+trailing explanation
+"""
+    patch = _clean_patch(raw)
+    assert patch.startswith("diff --git a/foo.txt")
+    assert "chatter" not in patch
+    assert "bar.txt" not in patch
+    assert "explanation" not in patch
+    assert patch.endswith("+hi\n")
+
+
+def test_clean_patch_allow_paths():
+    raw = "diff --git a/foo.txt b/foo.txt\n-a\n+b\n" "diff --git a/README.md b/README.md\n-c\n+d\n"
+    assert _clean_patch(raw, ["README.md"]) == "diff --git a/README.md b/README.md\n-c\n+d\n"
+    assert _clean_patch(raw, ["missing.md"]) == "diff --git a/foo.txt b/foo.txt\n-a\n+b\n"
+    assert _clean_patch("no diff here") == ""
+
+
+def test_rank_files_prefers_paths_matching_issue_words():
+    issue = IssueContext(number=1, title="Fix reviewer labels", body="labels are not removed")
+    files = [f"pkg/module_{i}.py" for i in range(10)] + ["pkg/reviewer.py", "pkg/labels_util.py"]
+    ranked = _rank_files(issue, files, limit=3)
+    assert ranked[:2] == ["pkg/reviewer.py", "pkg/labels_util.py"]
+    assert len(ranked) == 3
+    assert _rank_files(issue, files, limit=100) == files
+
+
+def test_evict_cached_repos_keeps_most_recent(tmp_path):
+    for i, name in enumerate(["a", "b", "c"]):
+        d = tmp_path / name
+        d.mkdir()
+        os.utime(d, (1_000 + i, 1_000 + i))
+    _evict_cached_repos(tmp_path, keep=2)
+    assert sorted(d.name for d in tmp_path.iterdir() if d.is_dir()) == ["b", "c"]
+
+
+def test_clean_patch_stops_reading_stream_after_diff():
+    consumed = []
+
+    def chunks():
+        for c in [
+            "plan\n```diff\ndiff --git a/f b/f\n-a",
+            "\n+b\n``",
+            "`\nmore text\n",
+            "never read",
+        ]:
+            consumed.append(c)
+            yield c
+
+    assert _clean_patch(chunks()) == "diff --git a/f b/f\n-a\n+b\n"
+    assert consumed[-1] != "never read"
+
+
+def test_shorten_collapses_whitespace_and_truncates():
+    assert _shorten("Agent: fix labels (#3)") == "Agent: fix labels (#3)"
+    assert _shorten(" a\tb\n\nc  d ") == "a b c d"
+    assert _shorten("x" * 80, 10) == "x" * 9 + "…"
+
+
+def test_find_files_in_pr_body():
+    body = 'Closes #3\n\n<!--sdlc-agent:files=["src/a.py", "README.md", 1]-->\n'
+    assert _find_files_in_pr_body(body) == ["src/a.py", "README.md"]
+    assert _find_files_in_pr_body("Closes #3") == []
+    assert _find_files_in_pr_body("<!--sdlc-agent:files=[oops]-->") == []
+    body += '<!--sdlc-agent:primary=["src/a.py"]-->\n'
+    assert _find_files_in_pr_body(body, key="primary") == ["src/a.py"]
+    assert _find_files_in_pr_body(body) == ["src/a.py", "README.md"]
+
+
+def test_read_files_outlines_large_secondary_python_files(tmp_path, monkeypatch):
+    body = "\n".join(f"x{i} = {i}" for i in range(1500))
+    src = f'@dec\nclass Foo(Base):\n    """Foo docs.\n\n    More."""\n\n    async def bar(self, n: int = 1) -> str:\n        pass\n{body}\n'
+    (tmp_path / "a.py").write_text(src)
+    (tmp_path / "b.py").write_text(src)
+    (tmp_path / "broken.py").write_text("def (:\n" + body)
+
+    files = _read_files(tmp_path, ["a.py", "b.py", "broken.py"], primary=["a.py"])
+    assert files["a.py"] == src
+    assert files["b.py"].splitlines()[1:] == [
+        "@dec",
+        "L2: class Foo(Base):",
+        '    """Foo docs."""',
+        "L7:     async def bar(self, n: int=1) -> str:",
+    ]
+    assert files["broken.py"].startswith("def (:")
+
+    # too large to parse for an outline: the head is read within the char budget instead
+    monkeypatch.setattr(code_agent, "OUTLINE_MAX_BYTES", 10_000)
+    assert _read_files(tmp_path, ["a.py", "b.py"], primary=["a.py"])["b.py"] == src
+
+
+def test_ensure_repo_dir_reuses_clone_without_stale_branches(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_agent, "_REPO_LOCKS", {})
+    origin = tmp_path / "origin"
+    origin.mkdir()
+    git(["init", "-q", "-b", "main"], cwd=origin)
+    git(
+        [
+            "-c",
+            "user.name=t",
+            "-c",
+            "user.email=t@e",
+            "commit",
+            "-q",
+            "--allow-empty",
+            "-m",
+            "init",
+        ],
+        cwd=origin,
+    )
+    cache = tmp_path / "cache"
+    clone = cache / "repos" / "o__r"
+    clone.parent.mkdir(parents=True)
+    git(["clone", "-q", str(origin), str(clone)], cwd=tmp_path)
+    git(["checkout", "-q", "-b", "agent/issue-1"], cwd=clone)
+    (clone / "junk.txt").write_text("x")
+
+    assert _ensure_repo_dir("o/r", token="t", repo_dir=None, cache_dir=cache) == clone
+    assert git(["for-each-ref", "refs/heads/"], cwd=clone).stdout == ""
+    assert not (clone / "junk.txt").exists()
+
+
+def test_ensure_repo_dir_falls_back_to_temp_clone_when_cache_is_busy(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_agent, "_REPO_LOCKS", {})
+    cloned = []
+    monkeypatch.setattr(
+        code_agent, "clone_repo", lambda name, *, token, dest, filter_spec: cloned.append(dest)
+    )
+    cache = tmp_path / "cache"
+    (cache / "repos").mkdir(parents=True)
+    other_run = code_agent._try_lock(cache / "repos" / "o__r")
+    try:
+        dest = _ensure_repo_dir("o/r", token="t", repo_dir=None, cache_dir=cache)
+    finally:
+        os.close(other_run)
+    assert cloned == [dest]
+    assert cache not in dest.parents
+
+
+class _IssueGitHub:
+    repo_full_name = "o/r"
+
+    def get_issue(self, number):
+        return {"title": "Fix bug", "body": ""}
+
+    def default_branch(self):
+        return "main"
+
+
+def test_run_issue_keeps_unpushed_commits_of_diverged_base(tmp_path, monkeypatch):
+    origin, work = tmp_path / "origin", tmp_path / "work"
+    origin.mkdir()
+    git(["init", "-q", "-b", "main"], cwd=origin)
+    ident = ["-c", "user.name=t", "-c", "user.email=t@e"]
+    git([*ident, "commit", "-q", "--allow-empty", "-m", "init"], cwd=origin)
+    git(["clone", "-q", str(origin), str(work)], cwd=tmp_path)
+    git([*ident, "commit", "-q", "--allow-empty", "-m", "unpushed"], cwd=work)
+    git([*ident, "commit", "-q", "--allow-empty", "-m", "upstream"], cwd=origin)
+    git(["fetch", "-q"], cwd=work)
+
+    monkeypatch.setattr(code_agent, "get_llm", lambda settings, **kw: None)
+    monkeypatch.setattr(
+        code_agent, "_prepare_workdir", lambda name, *, repo_dir, settings: repo_dir
+    )
+    settings = type("S", (), {"base_branch": None})()
+    with pytest.raises(CommandError):
+        code_agent._run_issue(_IssueGitHub(), issue_number=1, repo_dir=work, settings=settings)
+    assert git(["log", "-1", "--format=%s", "main"], cwd=work).stdout.strip() == "unpushed"
+
+
+class _ScriptedLLM:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+
+    def complete(self, *, system, user, temperature=0.2):
+        return self.answers.pop(0)
+
+    def complete_stream(self, *, system, user, temperature=0.2):
+        yield self.answers.pop(0)
+
+
+def test_select_files_does_not_cache_unparseable_answer(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_agent, "list_tracked_files", lambda cwd: ["a.py", "b.py"])
+    issue = IssueContext(number=1, title="t", body="")
+    llm = CachedLLM(
+        _ScriptedLLM("no json here", '{"files": ["b.py", 3]}'), cache_dir=tmp_path, model="m"
+    )
+
+    with pytest.raises(ValueError):
+        _select_files(llm, issue, tmp_path)
+    assert _select_files(llm, issue, tmp_path) == (["b.py"], [])
+    assert _select_files(llm, issue, tmp_path) == (["b.py"], [])  # cached now
+
+
+_PATCH = "diff --git a/f.txt b/f.txt\n--- a/f.txt\n+++ b/f.txt\n@@ -1 +1 @@\n-a\n+b\n"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(["init", "-q", "-b", "main"], cwd=tmp_path)
+    (tmp_path / "f.txt").write_text("a\n")
+    git(["add", "-A"], cwd=tmp_path)
+    git(["-c", "user.name=t", "-c", "user.email=t@e", "commit", "-qm", "init"], cwd=tmp_path)
+    return tmp_path
+
+
+def test_apply_llm_patch_checks_a_repeated_failed_patch_once(repo, monkeypatch):
+    checked = []
+    real_check = code_agent.check_patch
+
+    def check(patch, *, cwd):
+        checked.append(patch)
+        return real_check(patch, cwd=cwd)
+
+    monkeypatch.setattr(code_agent, "check_patch", check)
+    bad = _PATCH.replace("-a", "-x")
+
+    err = _apply_llm_patch(_ScriptedLLM(bad, bad), "p", workdir=repo, allow=None, concurrency=1)
+    assert "patch does not apply" in err
+    assert checked == [bad]
+    assert (repo / "f.txt").read_text() == "a\n"
+
+
+def test_apply_llm_patch_speculative_attempts(repo):
+    llm = _ScriptedLLM("plan\n" + _PATCH, _PATCH)
+    assert _apply_llm_patch(llm, "p", workdir=repo, allow=None, concurrency=2) == ""
+    assert (repo / "f.txt").read_text() == "b\n"
+
+
+class _NewPRGitHub(_IssueGitHub):
+    owner = "o"
+
+    def __init__(self):
+        self.calls = []
+
+    def list_pulls(self, *, state, head):
+        self.calls.append(("list_pulls", head))
+        return []
+
+    def list_issue_comments(self, number):
+        return []
+
+    def create_pull(self, *, title, body, head, base, draft):
+        self.calls.append(("create_pull", body))
+        return {"number": 9, "html_url": "https://github.com/o/r/pull/9"}
+
+    def create_issue_comment(self, number, body):
+        self.calls.append(("comment", body))
+
+    def add_labels(self, number, labels):
+        self.calls.append(("add", labels))
+
+
+def test_run_issue_pushes_patch_and_opens_pr(tmp_path, monkeypatch):
+    origin, work = tmp_path / "origin.git", tmp_path / "work"
+    git(["init", "-q", "--bare", "-b", "main", str(origin)], cwd=tmp_path)
+    git(["clone", "-q", str(origin), str(work)], cwd=tmp_path)
+    (work / "f.txt").write_text("a\n")
+    git(["add", "-A"], cwd=work)
+    for key, value in (("user.name", "t"), ("user.email", "t@e")):
+        git(["config", key, value], cwd=work)
+    git(["commit", "-qm", "init"], cwd=work)
+    git(["push", "-q", "origin", "main"], cwd=work)
+    git(["fetch", "-q"], cwd=work)
+
+    llm = _ScriptedLLM('{"files": ["f.txt"]}', _PATCH)
+    monkeypatch.setattr(code_agent, "get_llm", lambda settings, **kw: llm)
+    monkeypatch.setattr(
+        code_agent, "_prepare_workdir", lambda name, *, repo_dir, settings: repo_dir
+    )
+    settings = type("S", (), {"base_branch": None, "llm_concurrency": 1})()
+    gh = _NewPRGitHub()
+
+    code_agent._run_issue(gh, issue_number=1, repo_dir=work, settings=settings)
+
+    assert git(["show", "origin/agent/issue-1:f.txt"], cwd=work).stdout == "b\n"
+    assert gh.calls[0] == ("list_pulls", "o:agent/issue-1")
+    assert _find_files_in_pr_body(gh.calls[1][1]) == ["f.txt"]
+    assert gh.calls[2][0] == "comment"
+    assert gh.calls[3] == ("add", ["agent:managed", "agent:iter-1"])
+
+
+class _FlakyLLM:
+    """Attempt #1 fails; attempt #2 streams a valid patch."""
+
+    def complete_stream(self, *, system, user, temperature=0.2):
+        if "Попытка #2" not in user:
+            raise RuntimeError("connection reset")
+        yield _PATCH
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_apply_llm_patch_survives_a_failed_attempt(repo, concurrency):
+    assert (
+        _apply_llm_patch(_FlakyLLM(), "p", workdir=repo, allow=None, concurrency=concurrency) == ""
+    )
+    assert (repo / "f.txt").read_text() == "b\n"
+    # every attempt failed: the last error is reported instead of raised
+    assert _apply_llm_patch(
+        _ScriptedLLM(), "p", workdir=repo, allow=None, concurrency=concurrency
+    ).startswith("IndexError")
+
+
+class _SlowSecondAttemptLLM:
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def complete_stream(self, *, system, user, temperature=0.2):
+        if "Попытка #2" not in user:
+            yield _PATCH
+            return
+        try:
+            while True:
+                time.sleep(0.01)
+                yield " "
+        finally:
+            self.closed.set()
+
+
+def test_apply_llm_patch_stops_running_attempts_once_applied(repo):
+    llm = _SlowSecondAttemptLLM()
+    assert _apply_llm_patch(llm, "p", workdir=repo, allow=None, concurrency=2) == ""
+    assert llm.closed.wait(timeout=5)
+
+
+def test_tracked_only_drops_untracked_absolute_and_parent_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_agent, "list_tracked_files", lambda cwd: ["src/a.py", "README.md"])
+    paths = [
+        "/proc/self/environ",
+        "../../etc/passwd",
+        "src/../README.md",
+        "README.md",
+        "missing.py",
+        "src/a.py",
+    ]
+    assert _tracked_only(paths, tmp_path) == ["README.md", "src/a.py"]
+
+
+def test_select_files_ignores_paths_outside_the_repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_agent, "list_tracked_files", lambda cwd: ["a.py", "b.py"])
+    issue = IssueContext(number=1, title="t", body="")
+    llm = _ScriptedLLM('{"files": ["/proc/self/environ", "b.py"]}', '{"files": ["../x"]}')
+    assert _select_files(llm, issue, tmp_path) == (["b.py"], [])
+    assert _select_files(llm, issue, tmp_path) == (["a.py", "b.py"], [])
+
+
+def test_select_files_puts_files_to_edit_first(tmp_path, monkeypatch):
+    tracked = [f"m{i}.py" for i in range(10)]
+    monkeypatch.setattr(code_agent, "list_tracked_files", lambda cwd: tracked)
+    answer = {"files": tracked[:8], "primary": ["m9.py", "m2.py", "/etc/passwd"]}
+    llm = _ScriptedLLM(json.dumps(answer))
+    files, primary = _select_files(llm, IssueContext(number=1, title="t", body=""), tmp_path)
+    assert primary == ["m9.py", "m2.py"]
+    assert files == ["m9.py", "m2.py", "m0.py", "m1.py", "m3.py", "m4.py", "m5.py", "m6.py"]
@@ -0,0 +1,61 @@
+import pytest
+
+from sdlc_agent import git_utils
+from sdlc_agent.git_utils import (
+    RepoState,
+    apply_patch,
+    check_patch,
+    clone_repo,
+    git,
+    git_stdout_head,
+)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(["init", "-q", "-b", "main"], cwd=tmp_path)
+    git(["config", "user.name", "t"], cwd=tmp_path)
+    git(["config", "user.email", "t@example.com"], cwd=tmp_path)
+    (tmp_path / "f.txt").write_text("foo  \nbar\n")
+    git(["add", "-A"], cwd=tmp_path)
+    git(["commit", "-qm", "init"], cwd=tmp_path)
+    return tmp_path
+
+
+def test_check_patch_matches_apply_on_stripped_trailing_whitespace(repo):
+    # LLMs often drop trailing whitespace from context lines
+    patch = (
+        "diff --git a/f.txt b/f.txt\n--- a/f.txt\n+++ b/f.txt\n@@ -1,2 +1,2 @@\n foo\n-bar\n+baz\n"
+    )
+    assert check_patch(patch, cwd=repo).returncode == 0
+    assert apply_patch(patch, cwd=repo).returncode == 0
+    assert (repo / "f.txt").read_text().endswith("baz\n")
+
+    assert check_patch(patch.replace(" foo", " nope"), cwd=repo).returncode != 0
+
+
+def test_repo_state(repo):
+    assert not RepoState.read(cwd=repo).dirty
+    (repo / "f.txt.rej").write_text("x")
+    state = RepoState.read(cwd=repo)
+    assert state.dirty
+    assert state.has_rej
+
+
+def test_git_stdout_head_stops_at_budget(repo):
+    (repo / "big.txt").write_text("line\n" * 200_000)
+    git(["add", "big.txt"], cwd=repo)
+    assert (
+        git_stdout_head(["diff", "--cached"], cwd=repo, max_chars=500)
+        == git(["diff", "--cached"], cwd=repo).stdout[:500]
+    )
+    assert git_stdout_head(["log", "--format=%s"], cwd=repo, max_chars=500) == "init\n"
+
+
+def test_clone_repo_partial_skips_tags(tmp_path, monkeypatch):
+    cmds = []
+    monkeypatch.setattr(git_utils, "run_cmd", lambda cmd, *, cwd: cmds.append(cmd))
+    clone_repo("o/r", token="t", dest=tmp_path / "a", filter_spec="blob:none")
+    clone_repo("o/r", token="t", dest=tmp_path / "b")
+    assert cmds[0][2:4] == ["--filter=blob:none", "--no-tags"]
+    assert cmds[1][2].startswith("https://")
@@ -0,0 +1,64 @@
+import pytest
+
+from sdlc_agent.github_api import GitHubAPIError, GitHubREST
+
+
+class _Resp:
+    def __init__(self, status=200, data=None, next_url=None):
+        self.status_code = status
+        self.headers = {}
+        self.text = str(data)
+        self.links = {"next": {"url": next_url}} if next_url else {}
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _Session:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.headers = {}
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs.get("params"), kwargs.get("json")))
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def _client(*responses):
+    gh = GitHubREST(token="t", repo_full_name="o/r")
+    session = _Session(*responses)
+    object.__setattr__(gh, "_session", session)
+    return gh, session
+
+
+def test_list_issue_comments_follows_next_links_and_caches():
+    next_url = "https://api.github.com/repositories/1/issues/5/comments?per_page=100&page=2"
+    gh, session = _client(_Resp(data=[{"id": 1}], next_url=next_url), _Resp(data=[{"id": 2}]))
+
+    assert gh.list_issue_comments(5) == [{"id": 1}, {"id": 2}]
+    assert session.calls == [
+        ("GET", "https://api.github.com/repos/o/r/issues/5/comments", {"per_page": 100}, None),
+        ("GET", next_url, None, None),
+    ]
+    assert gh.list_issue_comments(5) == [{"id": 1}, {"id": 2}]
+    assert len(session.calls) == 2
+
+
+def test_set_labels_and_errors():
+    gh, session = _client(_Resp(data=[]), _Resp(204), _Resp(404, data={"message": "Not Found"}))
+
+    gh.set_labels(3, ["agent:managed", "", "agent:iter-2"])
+    assert session.calls[0] == (
+        "PUT",
+        "https://api.github.com/repos/o/r/issues/3/labels",
+        None,
+        {"labels": ["agent:managed", "agent:iter-2"]},
+    )
+    assert gh.remove_label(3, "agent:fix") is None
+    with pytest.raises(GitHubAPIError, match="404 for GET /repos/o/r/pulls/3"):
+        gh.get_pull(3)
@@ -0,0 +1,84 @@
+import pytest
+import requests
+
+from sdlc_agent import http_utils
+from sdlc_agent.http_utils import _server_delay, request_with_retry
+
+
+class _Resp:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class _Session:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+def test_retry_honors_retry_after_and_skips_client_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_utils.time, "sleep", sleeps.append)
+
+    s = _Session(_Resp(429, {"Retry-After": "5"}), _Resp(200))
+    assert request_with_retry(s, "POST", "u").status_code == 200
+    assert sleeps == [5.0]
+
+    s = _Session(_Resp(401), _Resp(200))
+    assert request_with_retry(s, "GET", "u").status_code == 401
+    assert s.calls == 1
+
+    # a 5xx on a non-idempotent call may already have had its effect
+    s = _Session(_Resp(502), _Resp(200))
+    assert request_with_retry(s, "POST", "u").status_code == 502
+    assert (
+        request_with_retry(
+            _Session(_Resp(502), _Resp(200)), "POST", "u", idempotent=True
+        ).status_code
+        == 200
+    )
+
+
+def test_retry_reraises_connection_error_after_last_attempt(monkeypatch):
+    monkeypatch.setattr(http_utils.time, "sleep", lambda _: None)
+    s = _Session(*(requests.ConnectionError("down") for _ in range(3)))
+    with pytest.raises(requests.ConnectionError):
+        request_with_retry(s, "GET", "u")
+    assert s.calls == 3
+
+
+def test_server_delay_reads_http_date_and_rate_limit_reset(monkeypatch):
+    monkeypatch.setattr(http_utils.time, "time", lambda: 1_000.0)
+    assert (
+        _server_delay(_Resp(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1030"}))
+        == 30.0
+    )
+    assert (
+        _server_delay(_Resp(403, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "1030"}))
+        == 0.0
+    )
+    assert _server_delay(_Resp(429, {"Retry-After": "Thu, 01 Jan 1970 00:17:00 GMT"})) == 20.0
+    assert _server_delay(_Resp(429, {"Retry-After": "soon"})) == 0.0
+
+
+def test_retry_gives_up_at_once_when_reset_is_beyond_max_wait(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_utils.time, "sleep", sleeps.append)
+    monkeypatch.setattr(http_utils.time, "time", lambda: 1_000.0)
+
+    exhausted = _Resp(403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "4600"})
+    s = _Session(exhausted, _Resp(200))
+    assert request_with_retry(s, "GET", "u") is exhausted
+    assert s.calls == 1
+    assert sleeps == []
@@ -0,0 +1,50 @@
+from sdlc_agent.llm import CachedLLM
+
+
+class _CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, *, system, user, temperature=0.2):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+    def complete_stream(self, *, system, user, temperature=0.2):
+        yield self.complete(system=system, user=user, temperature=temperature)
+
+
+def test_cached_llm_reuses_deterministic_answers(tmp_path):
+    inner = _CountingLLM()
+    llm = CachedLLM(inner, cache_dir=tmp_path, model="m")
+
+    assert llm.complete(system="s", user="u", temperature=0.0) == "answer 1"
+    assert llm.complete(system="s", user="u", temperature=0.0) == "answer 1"
+    assert (
+        CachedLLM(inner, cache_dir=tmp_path, model="m").complete(
+            system="s", user="u", temperature=0.0
+        )
+        == "answer 1"
+    )
+    assert inner.calls == 1
+
+    assert llm.complete(system="s", user="other", temperature=0.0) == "answer 2"
+    assert (
+        CachedLLM(inner, cache_dir=tmp_path, model="m2").complete(
+            system="s", user="u", temperature=0.0
+        )
+        == "answer 3"
+    )
+    assert llm.complete(system="s", user="u", temperature=0.2) == "answer 4"
+
+
+def test_cached_llm_discard_and_prune(tmp_path):
+    inner = _CountingLLM()
+    llm = CachedLLM(inner, cache_dir=tmp_path, model="m", max_entries=2)
+
+    assert llm.complete(system="s", user="u", temperature=0.0) == "answer 1"
+    llm.discard(system="s", user="u", temperature=0.0)
+    assert llm.complete(system="s", user="u", temperature=0.0) == "answer 2"
+
+    llm.complete(system="s", user="a", temperature=0.0)
+    llm.complete(system="s", user="b", temperature=0.0)
+    assert len(list(tmp_path.glob("*/*.txt"))) == 2
@@ -0,0 +1,161 @@
+import json
+
+import pytest
+
+from sdlc_agent.llm import CachedLLM, OpenAIChatLLM, YandexCompletionLLM, get_llm
+from sdlc_agent.llm.openai_chat import LLMError as OpenAIError
+from sdlc_agent.llm.yandex_completion import LLMError as YandexError
+from sdlc_agent.settings import Settings
+
+
+class _Resp:
+    def __init__(self, status=200, *, lines=(), data=None):
+        self.status_code = status
+        self.headers = {}
+        self.text = json.dumps(data)
+        self.encoding = None
+        self.lines = list(lines)
+        self.read = []
+        self.closed = False
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def iter_lines(self, decode_unicode=False):
+        for ln in self.lines:
+            self.read.append(ln)
+            yield ln
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+class _Session:
+    def __init__(self, resp):
+        self.resp = resp
+        self.kwargs = None
+
+    def request(self, method, url, **kwargs):
+        self.kwargs = kwargs
+        return self.resp
+
+
+def _with_session(llm, resp):
+    session = _Session(resp)
+    object.__setattr__(llm, "_session", session)
+    return session
+
+
+def test_openai_stream_yields_deltas_until_done():
+    llm = OpenAIChatLLM(api_key="k", prompt_cache_key="sdlc-o/r")
+    resp = _Resp(
+        lines=[
+            ": keep-alive",
+            "",
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            'data: {"choices": [{"delta": {"content": "diff "}}]}',
+            'data: {"choices": []}',
+            'data: {"choices": [{"delta": {"content": "--git"}}]}',
+            "data: [DONE]",
+            "data: never read",
+        ]
+    )
+    session = _with_session(llm, resp)
+
+    assert "".join(llm.complete_stream(system="s", user="u", temperature=0.0)) == "diff --git"
+    assert session.kwargs["stream"] is True
+    assert session.kwargs["json"]["stream"] is True
+    assert session.kwargs["json"]["prompt_cache_key"] == "sdlc-o/r"
+    assert resp.read[-1] == "data: [DONE]"
+    assert resp.closed
+
+
+def test_openai_stream_rejects_malformed_event():
+    llm = OpenAIChatLLM(api_key="k")
+    _with_session(llm, _Resp(lines=["data: {oops"]))
+    with pytest.raises(OpenAIError):
+        list(llm.complete_stream(system="s", user="u"))
+
+
+def test_openai_complete_and_errors():
+    llm = OpenAIChatLLM(api_key="k")
+    session = _with_session(llm, _Resp(data={"choices": [{"message": {"content": "hi"}}]}))
+    assert llm.complete(system="s", user="u") == "hi"
+    assert "stream" not in session.kwargs["json"]
+    assert "prompt_cache_key" not in session.kwargs["json"]
+
+    _with_session(llm, _Resp(data={"unexpected": True}))
+    with pytest.raises(OpenAIError):
+        llm.complete(system="s", user="u")
+
+    _with_session(llm, _Resp(400, data={"error": "bad"}))
+    with pytest.raises(OpenAIError, match="400"):
+        llm.complete(system="s", user="u")
+
+
+def _yandex_line(text):
+    return json.dumps({"result": {"alternatives": [{"message": {"text": text}}]}})
+
+
+def test_yandex_stream_yields_suffix_of_cumulative_text():
+    llm = YandexCompletionLLM(api_key="k", model_uri="gpt://f/yandexgpt")
+    resp = _Resp(
+        lines=[
+            _yandex_line("diff"),
+            "",
+            _yandex_line("diff"),
+            _yandex_line("diff --git"),
+            _yandex_line("diff --git a"),
+        ]
+    )
+    session = _with_session(llm, resp)
+
+    assert list(llm.complete_stream(system="s", user="u")) == ["diff", " --git", " a"]
+    assert session.kwargs["json"]["completionOptions"]["stream"] is True
+    assert session.kwargs["json"]["messages"] == [
+        {"role": "system", "text": "s"},
+        {"role": "user", "text": "u"},
+    ]
+    assert resp.closed
+
+
+def test_yandex_complete_and_errors():
+    llm = YandexCompletionLLM(api_key="k", model_uri="m")
+    _with_session(llm, _Resp(data={"result": {"alternatives": [{"message": {"text": "hi"}}]}}))
+    assert llm.complete(system="s", user="u") == "hi"
+
+    _with_session(llm, _Resp(lines=["not json"]))
+    with pytest.raises(YandexError):
+        list(llm.complete_stream(system="s", user="u"))
+
+    _with_session(llm, _Resp(data={"result": {}}))
+    with pytest.raises(YandexError):
+        llm.complete(system="s", user="u")
+
+    _with_session(llm, _Resp(403, data={"error": "denied"}))
+    with pytest.raises(YandexError, match="403"):
+        llm.complete(system="s", user="u")
+
+
+def test_get_llm_wraps_provider_in_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_PROVIDER", raising=False)
+    settings = Settings(github_token="t", openai_api_key="k", cache_dir=str(tmp_path))
+
+    llm = get_llm(settings, prompt_cache_key="sdlc-o/r")
+    assert isinstance(llm, CachedLLM)
+    assert llm.cache_dir == tmp_path / "llm"
+    assert llm.llm.prompt_cache_key == "sdlc-o/r"
+
+    proxied = Settings(
+        github_token="t", openai_api_key="k", openai_base_url="https://proxy", llm_cache=False
+    )
+    llm = get_llm(proxied, prompt_cache_key="sdlc-o/r")
+    assert isinstance(llm, OpenAIChatLLM)
+    assert llm.prompt_cache_key is None
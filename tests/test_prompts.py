@@ -0,0 +1,18 @@
+from sdlc_agent.prompts import IssueContext, build_file_select_prompt, build_patch_prompt
+
+
+def test_build_patch_prompt_keeps_braces_and_puts_feedback_last():
+    issue = IssueContext(number=7, title="Fix {name}", body="Body with {braces}\nsecond line")
+    prompt = build_patch_prompt(issue, {"a.py": "x = {}\n"}, feedback="use f-strings")
+    assert "Issue #7: Fix {name}" in prompt
+    assert "x = {}" in prompt
+    assert "\n    " not in prompt
+    assert prompt.endswith("use f-strings")
+
+
+def test_build_file_select_prompt_lists_files():
+    issue = IssueContext(number=1, title="t", body="b")
+    assert "Список файлов:\n- a.py\n- src/b.py\n\nIssue #1" in build_file_select_prompt(
+        issue, ["a.py", "src/b.py"]
+    )
+    assert "Список файлов:\n\n\nIssue #1" in build_file_select_prompt(issue, [])
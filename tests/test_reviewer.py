@@ -0,0 +1,132 @@
+import json
+
+from sdlc_agent import reviewer
+from sdlc_agent.git_utils import git
+from sdlc_agent.reviewer import _load_ci_results, _summarize_ci
+from sdlc_agent.settings import Settings
+
+
+def test_summarize_ci():
+    summary, tails, green = _summarize_ci(
+        {
+            "lint": {"exit_code": 0, "log_tail": "ok"},
+            "tests": {"exit_code": 1, "log_tail": "x" * 5000 + "FAILED"},
+        }
+    )
+    assert summary == "- ✅ **lint** (exit=0)\n- ❌ **tests** (exit=1)"
+    assert tails.startswith("## tests\n```\n")
+    assert tails.endswith("FAILED\n```")
+    assert len(tails) < 2100
+    assert green is False
+    assert _summarize_ci({}) == ("(нет данных)", "", True)
+    assert _summarize_ci({"lint": {"exit_code": 0, "log_tail": "ok"}})[1:] == ("", True)
+
+
+def test_load_ci_results(tmp_path):
+    path = tmp_path / "ci.json"
+    path.write_text('{"тесты": {"exit_code": 0}}', encoding="utf-8")
+    assert _load_ci_results(path) == {"тесты": {"exit_code": 0}}
+    assert _load_ci_results(tmp_path / "missing.json") == {}
+    assert _load_ci_results(None) == {}
+
+
+class _GitHub:
+    repo_full_name = "o/r"
+
+    def __init__(self, pr):
+        self.pr = pr
+        self.calls = []
+
+    def viewer_login(self):
+        return "reviewer-bot"
+
+    def get_pull(self, number):
+        return self.pr
+
+    def get_issue(self, number):
+        return {"title": "Fix bug", "body": "details"}
+
+    def create_issue_comment(self, number, body):
+        self.calls.append(("comment", body))
+
+    def add_labels(self, number, labels):
+        self.calls.append(("add", labels))
+
+    def remove_label(self, number, label):
+        self.calls.append(("remove", label))
+
+    def create_pull_review(self, number, *, body, event):
+        self.calls.append(("review", event))
+
+
+class _LLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompt = None
+
+    def complete(self, *, system, user, temperature=0.2):
+        self.prompt = user
+        return self.answer
+
+
+def _shas(tmp_path):
+    ident = ["-c", "user.name=t", "-c", "user.email=t@e"]
+    git(["init", "-q", "-b", "main"], cwd=tmp_path)
+    git([*ident, "commit", "-q", "--allow-empty", "-m", "base"], cwd=tmp_path)
+    base = git(["rev-parse", "HEAD"], cwd=tmp_path).stdout.strip()
+    (tmp_path / "f.txt").write_text("new\n")
+    git(["add", "-A"], cwd=tmp_path)
+    git([*ident, "commit", "-q", "-m", "head"], cwd=tmp_path)
+    return base, git(["rev-parse", "HEAD"], cwd=tmp_path).stdout.strip()
+
+
+def test_run_pr_review_labels_fix_after_comment_when_ci_is_red(tmp_path, monkeypatch):
+    base, head = _shas(tmp_path)
+    monkeypatch.delenv("GITHUB_STEP_SUMMARY", raising=False)
+    llm = _LLM(
+        '{"needs_changes": false, "summary_md": "ok", "review_md": "lgtm", "action_items": ["a"]}'
+    )
+    monkeypatch.setattr(reviewer, "get_llm", lambda settings, **kw: llm)
+    ci_path = tmp_path / "ci.json"
+    ci_path.write_text(json.dumps({"tests": {"exit_code": 1, "log_tail": "FAILED"}}))
+    pr = {
+        "body": "Closes #7",
+        "title": "Agent PR",
+        "user": {"login": "code-bot"},
+        "base": {"sha": base},
+        "head": {"sha": head},
+        "labels": [{"name": "agent:iter-1"}],
+    }
+    gh = _GitHub(pr)
+
+    reviewer._run_pr_review(
+        gh,
+        pr_number=3,
+        repo_dir=tmp_path,
+        settings=Settings(github_token="t"),
+        ci_results_path=ci_path,
+    )
+
+    assert "+new" in llm.prompt
+    assert "FAILED" in llm.prompt
+    kinds = [c[0] for c in gh.calls]
+    assert kinds.index("comment") < gh.calls.index(("add", ["agent:fix"]))
+    assert ("review", "REQUEST_CHANGES") in gh.calls
+    assert ("remove", "agent:done") in gh.calls
+
+
+def test_run_pr_review_refuses_self_review(tmp_path, monkeypatch):
+    summary = tmp_path / "summary.md"
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(summary))
+    gh = _GitHub({"body": "Closes #7", "user": {"login": "Reviewer-Bot"}})
+
+    reviewer._run_pr_review(
+        gh,
+        pr_number=3,
+        repo_dir=tmp_path,
+        settings=Settings(github_token="t"),
+        ci_results_path=None,
+    )
+
+    assert gh.calls[1:] == [("add", ["agent:stopped"]), ("remove", "agent:fix")]
+    assert "Self-review" in summary.read_text(encoding="utf-8")
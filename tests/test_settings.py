@@ -0,0 +1,16 @@
+from sdlc_agent.settings import Settings
+
+
+def test_from_env_is_cached_per_actor(monkeypatch):
+    Settings.invalidate()
+    monkeypatch.setenv("AGENT_MAX_ITERS", "5")
+    code = Settings.from_env(actor="code")
+    assert code.max_iters == 5
+
+    monkeypatch.setenv("AGENT_MAX_ITERS", "7")
+    assert Settings.from_env(actor="code") is code
+    assert Settings.from_env(actor="reviewer").max_iters == 7
+
+    Settings.invalidate()
+    assert Settings.from_env(actor="code").max_iters == 7
+    Settings.invalidate()
@@ -5,3 +5,10 @@ def test_get_iteration():
     labels = ["bug", "agent:iter-1", "agent:iter-3", "agent:managed"]
     assert get_iteration(labels) == 3
     assert set(iter_labels(labels)) == {"agent:iter-1", "agent:iter-3"}
+
+
+def test_get_iteration_ignores_malformed_iter_labels():
+    labels = ["agent:iter-", "agent:iter-x", "agent:iter--2", "agent:iter-2"]
+    assert get_iteration(labels) == 2
+    assert iter_labels(labels) == ["agent:iter-2"]
+    assert get_iteration([]) == 0
@@ -1,4 +1,4 @@
-from sdlc_agent.text_utils import extract_first_json, extract_unified_diff
+from sdlc_agent.text_utils import extract_codeblock, extract_first_json, extract_unified_diff
 
 
 def test_extract_first_json_codeblock():
@@ -26,3 +26,21 @@ index 111..222 100644
 """
     diff = extract_unified_diff(txt)
     assert "diff --git" in diff
+
+
+def test_extract_first_json_raw_object_in_prose():
+    txt = 'Use {placeholders} like this. Answer: {"files": ["a}.py"], "reason": "x {y"} done }'
+    assert extract_first_json(txt) == {"files": ["a}.py"], "reason": "x {y"}
+    assert extract_first_json('prefix { not closed {"a": {"b": 1}} tail') == {"a": {"b": 1}}
+
+
+def test_extract_codeblock_matches_language_tag_exactly():
+    txt = "```python\nprint(1)\n```\n```diffstat\n 1 file\n```\n```DIFF\n-a\n+b\n```"
+    assert extract_codeblock(txt, lang="diff") == "-a\n+b"
+    assert extract_codeblock(txt, lang="python") == "print(1)"
+    assert extract_codeblock(txt, lang="json") is None
+    assert extract_codeblock("```diff\nunclosed", lang="diff") is None
+
+
+def test_extract_first_json_after_stray_quote_in_braces():
+    assert extract_first_json('{bad "quote} {"files": []}') == {"files": []}